@@ -1,12 +1,15 @@
 """Goblin application class and class constructor"""
 
+import asyncio
 import collections
 import importlib
 import logging
 
 import aiogremlin
 
-from goblin import element, provider, session
+from goblin import bulk, element, exception, provider, session
+from goblin import metrics as goblin_metrics
+from goblin.fileio import backends
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,12 @@ class Goblin:
     :param asyncio.BaseEventLoop loop: Event loop implementation
     :param dict features: Vendor implementation specific database features
     :param dict config: Config parameters for application
+    :param json_backend: JSON library used to read and write GraphSON
+        files, 'orjson', 'ujson' or 'json'. Defaults to the fastest installed
+    :param goblin.metrics.Metrics metrics: Registry aggregating the metrics
+        recorded by sessions. Metrics are disabled if `None`
+    :param goblin.tracing.Tracer tracer: Default tracer of sessions, see
+        :py:mod:`goblin.tracing`
     """
 
     def __init__(self,
@@ -29,7 +38,10 @@ class Goblin:
                  *,
                  provider=provider.TinkerGraph,
                  get_hashable_id=None,
-                 aliases=None):
+                 aliases=None,
+                 json_backend=None,
+                 metrics=None,
+                 tracer=None):
         self._cluster = cluster
         self._loop = self._cluster._loop
         self._cluster = cluster
@@ -43,6 +55,10 @@ class Goblin:
         if aliases is None:
             aliases = {}
         self._aliases = aliases
+        self._json_backend = backends.get_backend(json_backend)
+        self._remote_connection = None
+        self._metrics = metrics
+        self._tracer = tracer
 
     @classmethod
     async def open(cls,
@@ -51,16 +67,71 @@ class Goblin:
                    provider=provider.TinkerGraph,
                    get_hashable_id=None,
                    aliases=None,
+                   json_backend=None,
+                   warmup=False,
+                   min_connections=None,
+                   metrics=None,
+                   tracer=None,
                    **config):
+        """
+        **coroutine** Open a cluster and create an app.
+
+        :param bool warmup: Run a trivial traversal on the pooled
+            connections to each host before returning, see
+            :py:meth:`warmup`
+        :param int min_connections: Number of connections opened to each
+            host when the cluster is opened. Raises
+            :py:class:`ConfigurationError<goblin.exception.ConfigurationError>`
+            if the config file sets conflicting connection limits
+        :param goblin.metrics.Metrics metrics: Registry used to record
+            metrics, including the bytes sent to the server. The message
+            serializer can't be set in a config file when metrics are used
+        :param goblin.tracing.Tracer tracer: Default tracer of sessions
+        :param config: Cluster configuration
+
+        :returns: :py:class:`Goblin` object
+        """
+        if min_connections:
+            config['min_conns'] = min_connections
+            config['max_conns'] = max(
+                config.get('max_conns', aiogremlin.Cluster.DEFAULT_CONFIG[
+                    'max_conns']), min_connections)
+        if metrics is not None:
+            serializer = config.get(
+                'message_serializer',
+                aiogremlin.Cluster.DEFAULT_CONFIG['message_serializer'])
+            serializer = goblin_metrics.MeteredMessageSerializer(
+                serializer, metrics)
+            config['message_serializer'] = serializer
         # App currently only supports GraphSON 1
         # aiogremlin does not yet support providers
         cluster = await aiogremlin.Cluster.open(
             loop, aliases=aliases, **config)
+        # Config files are loaded after the keyword configuration
+        error = None
+        if min_connections and (
+                cluster.config['min_conns'] != min_connections or
+                cluster.config['max_conns'] < min_connections):
+            error = ('min_connections conflicts with the connection limits '
+                     'set in the config file')
+        elif (metrics is not None and
+                cluster.config['message_serializer'] is not serializer):
+            error = ('The message serializer set in the config file can not '
+                     'be metered, pass message_serializer to Goblin.open '
+                     'instead')
+        if error:
+            await cluster.close()
+            raise exception.ConfigurationError(error)
         app = Goblin(
             cluster,
             provider=provider,
             get_hashable_id=get_hashable_id,
-            aliases=aliases)
+            aliases=aliases,
+            json_backend=json_backend,
+            metrics=metrics,
+            tracer=tracer)
+        if warmup:
+            await app.warmup()
         return app
 
     @property
@@ -86,6 +157,30 @@ class Goblin:
         """Registered edge classes"""
         return self._edges
 
+    @property
+    def json_backend(self):
+        """
+        :py:class:`JSONBackend<goblin.fileio.backends.JSONBackend>` used for
+        GraphSON files
+        """
+        return self._json_backend
+
+    @property
+    def metrics(self):
+        """
+        :py:class:`Metrics<goblin.metrics.Metrics>` registry of the app, or
+        `None` if metrics are disabled
+        """
+        return self._metrics
+
+    @property
+    def tracer(self):
+        """
+        :py:class:`Tracer<goblin.tracing.Tracer>` used by default by
+        sessions, or `None`
+        """
+        return self._tracer
+
     @property
     def url(self):
         """Database url"""
@@ -137,15 +232,92 @@ class Goblin:
                 elements.append(item)
         self.register(*elements)
 
-    async def session(self, *, processor='', op='eval', aliases=None):
+    async def session(self, *, processor='', op='eval', aliases=None,
+                      **options):
         """
-        Create a session object.
+        Create a session object. Sessions share the app's remote connection,
+        which is created by the first call.
+
+        :param options: Keyword options passed to
+            :py:class:`Session<goblin.session.Session>`, e.g.
+            `project_results`
 
         :returns: :py:class:`Session<goblin.session.Session>` object
         """
-        remote_connection = await aiogremlin.DriverRemoteConnection.using(
-            self._cluster, aliases=self._aliases)
-        return session.Session(self, remote_connection, self._get_hashable_id)
+        remote_connection = await self._get_remote_connection()
+        return session.Session(self, remote_connection, self._get_hashable_id,
+                               **options)
+
+    async def _get_remote_connection(self):
+        # The connection's client only holds the cluster and aliases, so it
+        # is safe to share. Concurrent callers wait on the same task.
+        if self._remote_connection is None:
+            self._remote_connection = self._loop.create_task(
+                aiogremlin.DriverRemoteConnection.using(
+                    self._cluster, aliases=self._aliases))
+        try:
+            return await asyncio.shield(self._remote_connection)
+        except Exception:
+            self._remote_connection = None
+            raise
+
+    async def warmup(self):
+        """
+        **coroutine** Prime the connections opened to each host when the
+        cluster was opened by running `g.inject(1)` on them, and create the
+        remote connection shared by sessions.
+        """
+        await self._get_remote_connection()
+        probes = self._cluster.config['min_conns']
+        await asyncio.gather(*[
+            self._probe(hostname)
+            for hostname in self._cluster.config['hosts']
+            for i in range(probes)])
+
+    async def ready(self, *, timeout=None):
+        """
+        **coroutine** Check that every host answers a trivial traversal.
+        Intended for health checks.
+
+        :param float timeout: Seconds to wait for all hosts
+
+        :returns: `bool`
+        """
+        probes = asyncio.gather(*[
+            self._probe(hostname)
+            for hostname in self._cluster.config['hosts']])
+        try:
+            await asyncio.wait_for(probes, timeout)
+        except Exception:
+            logger.warning('Gremlin Server hosts are not ready',
+                           exc_info=True)
+            return False
+        return True
+
+    async def _probe(self, hostname):
+        client = await self._cluster.connect(
+            hostname=hostname, aliases=self._aliases)
+        remote_connection = aiogremlin.DriverRemoteConnection(
+            client, self._loop)
+        g = aiogremlin.Graph().traversal().withRemote(remote_connection)
+        return await g.inject(1).next()
+
+    def bulk_loader(self, *, batch_size=500, max_inflight=4, on_batch=None):
+        """
+        Create a bulk loader, used to create large numbers of elements with
+        batched traversals.
+
+        :param int batch_size: Number of elements created by each traversal
+        :param int max_inflight: Maximum number of batches submitted
+            concurrently
+        :param on_batch: Optional callable called with a
+            :py:class:`BatchResult<goblin.bulk.BatchResult>` for each batch
+
+        :returns: :py:class:`BulkLoader<goblin.bulk.BulkLoader>` object
+        """
+        return bulk.BulkLoader(self, batch_size=batch_size,
+                               max_inflight=max_inflight, on_batch=on_batch)
 
     async def close(self):
+        self._remote_connection = None
         await self._cluster.close()
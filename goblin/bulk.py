@@ -0,0 +1,162 @@
+"""Bulk loading of large numbers of elements"""
+
+import asyncio
+import collections
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+BatchResult = collections.namedtuple(
+    "BatchResult", "index size ids error elapsed")
+
+
+class BulkLoadStats:
+    """Running totals for a :py:class:`BulkLoader` load"""
+
+    def __init__(self):
+        self.elements = 0
+        self.failed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """Elements loaded per second"""
+        if not self.elapsed:
+            return 0.0
+        return (self.elements - self.failed) / self.elapsed
+
+    def __repr__(self):
+        return ('<{}(elements={}, failed={}, batches={}, failed_batches={}, '
+                'throughput={:.1f}/s)>'.format(
+                    self.__class__.__name__, self.elements, self.failed,
+                    self.batches, self.failed_batches, self.throughput))
+
+
+class BulkLoader:
+    """
+    Creates large numbers of elements using batched traversals, keeping
+    several batches in flight across the cluster's connection pool. Elements
+    loaded are not tracked by a session identity map. Don't instantiate
+    directly, instead use
+    :py:meth:`Goblin.bulk_loader<goblin.app.Goblin.bulk_loader>`.
+
+    :param goblin.app.Goblin app:
+    :param int batch_size: Number of elements created by each traversal
+    :param int max_inflight: Maximum number of batches submitted
+        concurrently. Consumption of the input pauses while this many
+        batches are in flight
+    :param on_batch: Optional callable called with a :py:class:`BatchResult`
+        as each batch completes
+    """
+
+    def __init__(self, app, *, batch_size=500, max_inflight=4, on_batch=None):
+        self._app = app
+        self._loop = app._loop
+        self._batch_size = batch_size
+        self._max_inflight = max_inflight
+        self._on_batch = on_batch
+        self._session = None
+        self._batch = []
+        self._batch_index = 0
+        self._inflight = set()
+        self._stats = None
+        self._start = None
+
+    @property
+    def stats(self):
+        """:py:class:`BulkLoadStats` of the current or last load"""
+        return self._stats
+
+    async def load(self, elements):
+        """
+        Create elements in the db. Edges may reference vertices loaded
+        earlier in the same call.
+
+        :param elements: Iterable or async iterable of
+            :py:class:`Element<goblin.element.Element>` objects
+
+        :returns: :py:class:`BulkLoadStats` object
+        """
+        if self._session is None:
+            self._session = await self._app.session()
+        self._stats = BulkLoadStats()
+        self._start = time.monotonic()
+        try:
+            if hasattr(elements, '__aiter__'):
+                async for elem in elements:
+                    await self._add(elem)
+            else:
+                for elem in elements:
+                    await self._add(elem)
+            await self._dispatch()
+            await self._wait(0)
+        except BaseException:
+            for task in self._inflight:
+                task.cancel()
+            raise
+        finally:
+            self._inflight = set()
+            self._batch = []
+            self._stats.elapsed = time.monotonic() - self._start
+        return self._stats
+
+    async def _add(self, elem):
+        self._batch.append(elem)
+        if len(self._batch) >= self._batch_size:
+            await self._dispatch()
+
+    async def _dispatch(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        if self._depends_on_inflight(batch):
+            # Edge vertices are still being created by earlier batches
+            await self._wait(0)
+        await self._wait(self._max_inflight - 1)
+        index = self._batch_index
+        self._batch_index += 1
+        self._inflight.add(
+            self._loop.create_task(self._load_batch(index, batch)))
+
+    def _depends_on_inflight(self, batch):
+        members = {id(elem) for elem in batch}
+        for elem in batch:
+            if elem.__type__ == 'edge':
+                for vertex in (elem.source, elem.target):
+                    if (vertex is not None and id(vertex) not in members and
+                            not hasattr(vertex, 'id')):
+                        return True
+        return False
+
+    async def _wait(self, limit):
+        """Wait until at most limit batches are in flight"""
+        while len(self._inflight) > limit:
+            done, self._inflight = await asyncio.wait(
+                self._inflight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+    async def _load_batch(self, index, batch):
+        start = time.monotonic()
+        ids = []
+        error = None
+        try:
+            ids = await self._session._create_chunk(batch, track=False)
+        except Exception as e:
+            logger.exception('Bulk load batch %s failed', index)
+            error = e
+        result = BatchResult(index, len(batch), ids, error,
+                             time.monotonic() - start)
+        self._stats.elements += len(batch)
+        self._stats.batches += 1
+        if error is not None:
+            self._stats.failed += len(batch)
+            self._stats.failed_batches += 1
+        self._stats.elapsed = time.monotonic() - self._start
+        if self._on_batch is not None:
+            self._on_batch(result)
+        return result
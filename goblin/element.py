@@ -16,9 +16,16 @@ class ElementMeta(type):
     :py:class:`Mapping<goblin.mapper.Mapping>` object and replacing user
     defined :py:class:`goblin.properties.Property` with
     :py:class:`goblin.properties.PropertyDescriptor`.
+
+    Passing the class keyword `slots=True` generates `__slots__` for the
+    attributes that store property values, avoiding a per-instance
+    `__dict__` when all base classes are slotted as well::
+
+        class Person(goblin.Vertex, slots=True):
+            name = goblin.Property(goblin.String)
     """
 
-    def __new__(cls, name, bases, namespace, **kwds):
+    def __new__(cls, name, bases, namespace, *, slots=False, **kwds):
         props = {}
         if name == 'VertexProperty':
             element_type = name.lower()
@@ -50,13 +57,36 @@ class ElementMeta(type):
             new_namespace[k] = v
         new_namespace['__mapping__'] = mapper.create_mapping(namespace, props)
         new_namespace['__properties__'] = props
-        result = type.__new__(cls, name, bases, new_namespace)
+        if slots and '__slots__' not in namespace:
+            new_namespace['__slots__'] = _element_slots(element_type, bases,
+                                                        props)
+        result = type.__new__(cls, name, bases, new_namespace, **kwds)
         return result
 
+    def __init__(cls, name, bases, namespace, *, slots=False, **kwds):
+        super().__init__(name, bases, namespace, **kwds)
+
+
+def _element_slots(element_type, bases, props):
+    """Slot names for an element class not already provided by its bases"""
+    names = ['_id', '__snapshot__']
+    if element_type == 'edge':
+        names.extend(['_source', '_target'])
+    names.extend('_' + key for key in props if key != 'id')
+    existing = set()
+    for base in bases:
+        for klass in base.__mro__:
+            existing.update(klass.__dict__.get('__slots__', ()))
+    if not any(hasattr(base, '__weakref__') for base in bases):
+        names.append('__weakref__')
+    return tuple(name for name in names if name not in existing)
+
 
 class Element(metaclass=ElementMeta):
     """Base class for classes that implement the Element property interface"""
 
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if not (hasattr(self, key) and isinstance(
@@ -86,13 +116,19 @@ class VertexPropertyDescriptor:
     def __get__(self, obj, objtype):
         if obj is None:
             return getattr(objtype.__mapping__, self._prop_name)
+        try:
+            return getattr(obj, self._name)
+        except AttributeError:
+            pass
         default = self._default
-        if default is not None:
-
-            default = self._data_type.validate_vertex_prop(
-                default, self._cardinality, self._vertex_property,
-                self._data_type)
-        return getattr(obj, self._name, default)
+        if default is None:
+            return None
+        # Materialize the default once, so later reads return the same object
+        default = self._data_type.validate_vertex_prop(
+            default, self._cardinality, self._vertex_property,
+            self._data_type)
+        setattr(obj, self._name, default)
+        return default
 
     def __set__(self, obj, val):
         if val is not None:
@@ -106,6 +142,9 @@ class VertexProperty(Element, abc.BaseProperty):
 
     __descriptor__ = VertexPropertyDescriptor
 
+    # Weak references to the managers this vertex property belongs to
+    _owners = ()
+
     def __init__(self,
                  data_type,
                  *,
@@ -114,8 +153,7 @@ class VertexProperty(Element, abc.BaseProperty):
                  card=None,
                  db_name_factory=None):
         if not db_name_factory:
-            def db_name_factory(x, y):
-                pass
+            db_name_factory = properties.noop_factory
         if isinstance(data_type, type):
             data_type = data_type()
         self._db_name_factory = db_name_factory
@@ -162,6 +200,24 @@ class VertexProperty(Element, abc.BaseProperty):
 
     def setvalue(self, val):
         self._val = val
+        # Lets vertex property managers detect stale value indexes
+        for ref in self._owners:
+            owner = ref()
+            if owner is not None:
+                owner._value_changed()
+
+    def __getstate__(self):
+        # Managers register again with the vertex properties when unpickled
+        state = dict(self.__dict__)
+        state.pop('_owners', None)
+        slots = {}
+        for klass in self.__class__.__mro__:
+            for name in klass.__dict__.get('__slots__', ()):
+                if name != '__weakref__' and hasattr(self, name):
+                    slots[name] = getattr(self, name)
+        if slots:
+            return state, slots
+        return state
 
     value = property(getvalue, setvalue)
 
@@ -185,6 +241,8 @@ class VertexProperty(Element, abc.BaseProperty):
 class Vertex(Element):
     """Base class for user defined Vertex classes"""
 
+    __slots__ = ()
+
     def to_dict(self):
         result = {'__label__': self.__label__, '__type__': self.__type__}
         for key, value in self.__properties__.items():
@@ -244,6 +302,8 @@ class Edge(Element):
     :param Vertex target: Target (inV) vertex
     """
 
+    __slots__ = ()
+
     def __init__(self, source=None, target=None):
         self.source = source
         self.target = target
@@ -304,3 +364,73 @@ class GenericEdge(Edge):
     Generally not instantiated by end user.
     """
     pass
+
+
+class ElementProxy:
+    """
+    Lightweight stand-in for a vertex or edge returned by a lazy traversal.
+    Carries the element id and label, the rest of the element is fetched by
+    :py:meth:`load`, which loads all of the unloaded proxies created by the
+    same session in one batch. Generally not instantiated by end user.
+
+    :param goblin.session.Session session: Session that created the proxy
+    :param obj: Vertex or edge returned by the database
+    :param Element element: Element already hydrated by the session, if any
+    """
+
+    __slots__ = ('_session', '_obj', '_element', '__weakref__')
+
+    def __init__(self, session, obj, *, element=None):
+        self._session = session
+        self._obj = obj
+        self._element = element
+
+    @property
+    def id(self):
+        return self._obj.id
+
+    @property
+    def label(self):
+        if self._element is not None:
+            return self._element.__label__
+        return self._obj.label
+
+    @property
+    def obj(self):
+        """Vertex or edge returned by the database"""
+        return self._obj
+
+    @property
+    def loaded(self):
+        return self._element is not None
+
+    def getelement(self):
+        if self._element is None:
+            raise exception.ElementError(
+                "Element proxy {} is not loaded, use `await proxy.load()`"
+                .format(self))
+        return self._element
+
+    def setelement(self, element):
+        self._element = element
+
+    element = property(getelement, setelement)
+
+    async def load(self):
+        """
+        Fetch the proxied element, if necessary.
+
+        :returns: :py:class:`Element` object
+        """
+        if self._element is None:
+            await self._session.load_proxies(self)
+        return self.element
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.element, name)
+
+    def __repr__(self):
+        return '<{}(id={}, label={}, loaded={})>'.format(
+            self.__class__.__name__, self.id, self.label, self.loaded)
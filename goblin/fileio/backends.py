@@ -0,0 +1,89 @@
+"""JSON serialization backends used to read and write GraphSON files"""
+
+import collections
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from goblin import exception
+
+
+class JSONBackend:
+    """
+    Wraps the `dumps`/`loads` functions of a JSON library.
+
+    :param str name: Backend name
+    :param dumps: Callable serializing an object to a `str`
+    :param loads: Callable parsing a `str` or `bytes`
+    """
+
+    def __init__(self, name, dumps, loads):
+        self._name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    @property
+    def name(self):
+        return self._name
+
+    def __repr__(self):
+        return '<{}(name={})>'.format(self.__class__.__name__, self._name)
+
+
+def _orjson_backend():
+    def dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+    return JSONBackend('orjson', dumps, orjson.loads)
+
+
+def _ujson_backend():
+    return JSONBackend('ujson', ujson.dumps, ujson.loads)
+
+
+def _json_backend():
+    return JSONBackend('json', json.dumps, json.loads)
+
+
+# In order of preference
+_BACKENDS = collections.OrderedDict([
+    ('orjson', (lambda: orjson is not None, _orjson_backend)),
+    ('ujson', (lambda: ujson is not None, _ujson_backend)),
+    ('json', (lambda: True, _json_backend))])
+
+
+def available_backends():
+    """Names of the backends that can be used, fastest first"""
+    return [name for name, (available, _) in _BACKENDS.items()
+            if available()]
+
+
+def get_backend(backend=None):
+    """
+    Get a JSON backend.
+
+    :param backend: Backend name ('orjson', 'ujson' or 'json'), or a
+        :py:class:`JSONBackend`. By default the fastest installed library is
+        used
+
+    :returns: :py:class:`JSONBackend` object
+    """
+    if isinstance(backend, JSONBackend):
+        return backend
+    if backend is None:
+        backend = available_backends()[0]
+    try:
+        available, factory = _BACKENDS[backend]
+    except KeyError:
+        raise exception.ConfigurationError(
+            "Unknown JSON backend: {}".format(backend))
+    if not available():
+        raise exception.ConfigurationError(
+            "JSON backend {} is not installed".format(backend))
+    return factory()
@@ -1,44 +1,572 @@
+import bz2
 import collections
+import concurrent.futures
+import contextlib
+import gzip
+import io
+import itertools
+import lzma
+import os
+import threading
 try:
-    import ujson as json
+    import zstandard
 except ImportError:
-    import json
+    zstandard = None
 
+from gremlin_python.structure import graph
+from gremlin_python.statics import long
 from gremlin_python.structure.io import graphson
-from goblin.element import Vertex, Edge, VertexProperty
-from goblin.manager import ListVertexPropertyManager
+from goblin import exception
+from goblin.element import (
+    Vertex, Edge, VertexProperty, GenericEdge, GenericVertex)
+from goblin.fileio import backends
+from goblin.manager import VertexPropertyManager
+from goblin.properties import Boolean, Float, Integer, String
 
 
 writer = graphson.GraphSONWriter()
+reader = graphson.GraphSONReader()
 
 
 AdjList = collections.namedtuple("AdjList", "vertex inE outE")
 
-vp_id = 10
 
+def _write_plain(val):
+    if val is None or type(val) is str or type(val) is bool:
+        return val
+    return writer.toDict(val)
+
+
+def _write_integer(val):
+    if type(val) is int:
+        return {"@type": "g:Int32", "@value": val}
+    elif type(val) is long:
+        return {"@type": "g:Int64", "@value": val}
+    return writer.toDict(val)
+
+
+def _write_float(val):
+    if type(val) is float:
+        return {"@type": "g:Double", "@value": val}
+    return writer.toDict(val)
+
+
+# Typed GraphSON for the primitive data types, bypassing the generic
+# GraphSONWriter dispatch. Other values go through writer.toDict
+_TYPED_WRITERS = {
+    String: _write_plain,
+    Boolean: _write_plain,
+    Integer: _write_integer,
+    Float: _write_float}
+
+
+def _value_writer(data_type):
+    return _TYPED_WRITERS.get(type(data_type), writer.toDict)
+
+
+class IdAllocator:
+    """
+    Thread safe counter used to assign vertex property ids.
+
+    :param int start: First id allocated
+    """
+
+    def __init__(self, start=0):
+        self._next = start
+        self._lock = threading.Lock()
+
+    @property
+    def next(self):
+        """Next id that will be allocated"""
+        return self._next
+
+    def allocate(self):
+        """Allocate a single id"""
+        with self._lock:
+            val = self._next
+            self._next += 1
+        return val
+
+    def reserve_block(self, size):
+        """
+        Reserve `size` consecutive ids.
+
+        :returns: First id of the block
+        """
+        with self._lock:
+            start = self._next
+            self._next += size
+        return start
+
+
+class GraphSONExporter:
+    """
+    Converts Goblin elements to GraphSON adjacency lists. Each exporter owns
+    the allocation of vertex property ids, so exports using separate
+    exporters are independent and repeatable.
+
+    :param int start: First vertex property id
+    :param IdAllocator id_allocator: Allocator to share between exporters,
+        overrides `start`
+    :param json_backend: JSON backend name or object, see
+        :py:func:`goblin.fileio.backends.get_backend`
+    """
+
+    def __init__(self, *, start=10, id_allocator=None, json_backend=None):
+        if id_allocator is None:
+            id_allocator = IdAllocator(start)
+        self._ids = id_allocator
+        self._json = backends.get_backend(json_backend)
+
+    @property
+    def id_allocator(self):
+        return self._ids
+
+    @property
+    def json_backend(self):
+        return self._json
+
+    def dump(self, fpath, *adj_lists, mode="w", compression="infer",
+             max_lines=None, max_bytes=None):
+        """
+        Convert Goblin elements to GraphSON
+
+        :param fpath: Path, or text or binary file-like object. A directory
+            path if `max_lines` or `max_bytes` is set
+        :param str compression: One of 'gzip', 'bz2', 'xz', 'zstd' or
+            `None`. By default inferred from the file extension
+        :param int max_lines: Start a new part file (part-00000, ...) in the
+            `fpath` directory after this many lines
+        :param int max_bytes: Start a new part file in the `fpath` directory
+            once this many uncompressed bytes have been written to the
+            current one
+        """
+        with _open_output(fpath, mode, compression, max_lines,
+                          max_bytes) as f:
+            for adj_list in adj_lists:
+                dumped = self.dumps(adj_list)
+                f.write(dumped + '\n')
+
+    def dumps(self, adj_list):
+        """Convert Goblin elements to GraphSON"""
+        vertex = self._prep_vertex(adj_list.vertex)
+        for inE in adj_list.inE:
+            prepped = _prep_edge(inE, "inV")
+            label = inE.__label__
+            vertex["inE"].setdefault(label, [])
+            vertex["inE"][label].append(prepped)
+        for outE in adj_list.outE:
+            prepped = _prep_edge(outE, "outV")
+            label = outE.__label__
+            vertex["outE"].setdefault(label, [])
+            vertex["outE"][label].append(prepped)
+        return self._json.dumps(vertex)
+
+    def dump_parallel(self, fpath, adj_lists, *, workers=None, ordered=True,
+                      chunksize=1000, shards=None, mode="w",
+                      compression="infer"):
+        """
+        Convert Goblin elements to GraphSON, serializing chunks of adjacency
+        lists in a process pool. Elements must be picklable, so their
+        classes have to be importable by the worker processes.
+
+        :param str fpath: Path to the output file, or to the output directory
+            when `shards` is set
+        :param adj_lists: Iterable of :py:class:`AdjList` objects, consumed
+            incrementally
+        :param int workers: Number of worker processes, defaults to the
+            number of CPUs
+        :param bool ordered: Write chunks in input order. Otherwise chunks
+            are written as soon as they are serialized
+        :param int chunksize: Number of adjacency lists serialized per task
+        :param int shards: Write this many part files (part-00000, ...) to
+            the `fpath` directory instead of a single file. Chunks are
+            assigned to part files round robin
+        :param str compression: Compression of the output files, see
+            :py:meth:`dump`
+        """
+        with contextlib.ExitStack() as stack:
+            if shards:
+                os.makedirs(fpath, exist_ok=True)
+                suffix = _compression_suffix(compression)
+                files = [
+                    stack.enter_context(_open_text(
+                        os.path.join(fpath, _part_name(i, suffix)), mode,
+                        compression))
+                    for i in range(shards)]
+            else:
+                files = [stack.enter_context(
+                    _open_text(fpath, mode, compression))]
+            max_pending = 2 * (workers or os.cpu_count() or 1)
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                pending = collections.OrderedDict()
+                for index, chunk in enumerate(_chunks(adj_lists, chunksize)):
+                    # Workers assign ids from a block reserved for the chunk,
+                    # so ordered output matches a sequential dump
+                    start = self._ids.reserve_block(
+                        sum(_count_vps(adj_list.vertex)
+                            for adj_list in chunk))
+                    future = executor.submit(_dumps_chunk, start, chunk,
+                                             self._json.name)
+                    pending[future] = files[index % len(files)]
+                    if len(pending) >= max_pending:
+                        _write_chunks(pending, ordered)
+                while pending:
+                    _write_chunks(pending, ordered)
+
+    def _prep_vertex(self, v):
+        mapping = v.__mapping__
+        properties = v.__properties__
+        vertex = {
+                "id": {
+                    "@type": "g:Int32",
+                    "@value": v.id
+                },
+                "label": v.__label__,
+                "properties": {},
+                "outE": {},
+                "inE": {}
+        }
+
+        for db_name, (ogm_name, data_type) in mapping.db_properties.items():
+            prop = properties[ogm_name]
+            to_dict = _value_writer(data_type)
+            vertex["properties"].setdefault(db_name, [])
+            if isinstance(prop, VertexProperty):
+                prop = getattr(v, ogm_name)
+                if isinstance(prop, VertexPropertyManager):
+                    for p in prop:
+                        vp = self._prep_vp(p, p.value, to_dict)
+                        vertex["properties"][db_name].append(vp)
+                    continue
+                value = getattr(prop, 'value', None)
+            else:
+                value = getattr(v, ogm_name)
+            vp = self._prep_vp(prop, value, to_dict)
+            vertex["properties"][db_name].append(vp)
+        return vertex
+
+    def _prep_vp(self, prop, value, to_dict):
+        vp = {
+                "id": {
+                    "@type": "g:Int64",
+                    "@value": self._ids.allocate()
+                },
+                "value": to_dict(value),
+                "properties": {}
+        }
+        if isinstance(prop, VertexProperty):
+            mapping = prop.__mapping__
+            for db_name, (ogm_name, data_type) in \
+                    mapping.db_properties.items():
+                vp["properties"][db_name] = _value_writer(data_type)(
+                    getattr(prop, ogm_name))
+        return vp
 
-def dump(fpath, *adj_lists, mode="w"):
-    """Convert Goblin elements to GraphSON"""
-    with open(fpath, mode) as f:
-        for adj_list in adj_lists:
-            dumped = dumps(adj_list)
-            f.write(dumped + '\n')
+
+_exporter = GraphSONExporter()
+
+
+def dump(fpath, *adj_lists, mode="w", **options):
+    """
+    Convert Goblin elements to GraphSON. See
+    :py:meth:`GraphSONExporter.dump`.
+    """
+    _exporter.dump(fpath, *adj_lists, mode=mode, **options)
 
 
 def dumps(adj_list):
     """Convert Goblin elements to GraphSON"""
-    vertex = _prep_vertex(adj_list.vertex)
-    for inE in adj_list.inE:
-        prepped = _prep_edge(inE, "inV")
-        label = inE.__label__
-        vertex["inE"].setdefault(label, [])
-        vertex["inE"][label].append(prepped)
-    for outE in adj_list.outE:
-        prepped = _prep_edge(outE, "outV")
-        label = outE.__label__
-        vertex["outE"].setdefault(label, [])
-        vertex["outE"][label].append(prepped)
-    return json.dumps(vertex)
+    return _exporter.dumps(adj_list)
+
+
+def dump_parallel(fpath, adj_lists, **options):
+    """
+    Convert Goblin elements to GraphSON using a process pool. See
+    :py:meth:`GraphSONExporter.dump_parallel`.
+    """
+    _exporter.dump_parallel(fpath, adj_lists, **options)
+
+
+_COMPRESSION_SUFFIXES = collections.OrderedDict([
+    ('.gz', 'gzip'), ('.bz2', 'bz2'), ('.xz', 'xz'), ('.zst', 'zstd')])
+
+
+def _infer_compression(target, compression):
+    if compression == "infer":
+        if isinstance(target, str):
+            return _COMPRESSION_SUFFIXES.get(os.path.splitext(target)[1])
+        return None
+    return compression
+
+
+def _compression_suffix(compression):
+    for suffix, name in _COMPRESSION_SUFFIXES.items():
+        if name == compression:
+            return suffix
+    return ''
+
+
+def _part_name(index, suffix):
+    return 'part-{:05d}{}'.format(index, suffix)
+
+
+def _open_zstd(target, mode, **kwargs):
+    if zstandard is None:
+        raise exception.ConfigurationError(
+            "zstd compression requires the zstandard package")
+    if not isinstance(target, str):
+        kwargs['closefd'] = False
+    return zstandard.open(target, mode, **kwargs)
+
+
+_OPENERS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+    'zstd': _open_zstd}
+
+
+@contextlib.contextmanager
+def _open_text(target, mode, compression="infer"):
+    """
+    Open a path, or wrap a text or binary file-like object, for text IO with
+    optional compression. File-like objects are left open.
+    """
+    mode = mode.replace('b', '').replace('t', '')
+    compression = _infer_compression(target, compression)
+    if compression is not None and compression not in _OPENERS:
+        raise exception.ConfigurationError(
+            "Unknown compression: {}".format(compression))
+    if isinstance(target, str):
+        if compression:
+            f = _OPENERS[compression](target, mode + 't', encoding='utf-8')
+        else:
+            f = open(target, mode)
+        with f:
+            yield f
+        return
+    if compression is None and isinstance(target, io.TextIOBase):
+        yield target
+        return
+    raw = target
+    if compression:
+        raw = _OPENERS[compression](target, mode + 'b')
+    f = io.TextIOWrapper(raw, encoding='utf-8')
+    try:
+        yield f
+    finally:
+        f.flush()
+        f.detach()
+        if raw is not target:
+            raw.close()
+
+
+@contextlib.contextmanager
+def _open_output(fpath, mode, compression, max_lines, max_bytes):
+    if not (max_lines or max_bytes):
+        with _open_text(fpath, mode, compression) as f:
+            yield f
+        return
+    output = _RolloverWriter(fpath, mode, compression, max_lines, max_bytes)
+    try:
+        yield output
+    finally:
+        output.close()
+
+
+class _RolloverWriter:
+    """Writes lines to numbered part files in a directory"""
+
+    def __init__(self, dirpath, mode, compression, max_lines, max_bytes):
+        os.makedirs(dirpath, exist_ok=True)
+        if compression == "infer":
+            compression = None
+        self._dirpath = dirpath
+        self._mode = mode
+        self._compression = compression
+        self._suffix = _compression_suffix(compression)
+        self._max_lines = max_lines
+        self._max_bytes = max_bytes
+        self._part = 0
+        self._context = None
+        self._file = None
+        self._lines = 0
+        self._bytes = 0
+
+    def write(self, data):
+        if self._file is None or self._full():
+            self._rollover()
+        self._file.write(data)
+        self._lines += data.count('\n')
+        if self._max_bytes:
+            self._bytes += len(data.encode('utf-8'))
+
+    def _full(self):
+        return ((self._max_lines and self._lines >= self._max_lines) or
+                (self._max_bytes and self._bytes >= self._max_bytes))
+
+    def _rollover(self):
+        self.close()
+        path = os.path.join(self._dirpath,
+                            _part_name(self._part, self._suffix))
+        self._context = _open_text(path, self._mode, self._compression)
+        self._file = self._context.__enter__()
+        self._part += 1
+        self._lines = 0
+        self._bytes = 0
+
+    def close(self):
+        if self._context is not None:
+            self._context.__exit__(None, None, None)
+            self._context = None
+            self._file = None
+
+
+def _chunks(adj_lists, chunksize):
+    adj_lists = iter(adj_lists)
+    while True:
+        chunk = list(itertools.islice(adj_lists, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _dumps_chunk(start, chunk, json_backend):
+    exporter = GraphSONExporter(start=start, json_backend=json_backend)
+    return ''.join(exporter.dumps(adj_list) + '\n' for adj_list in chunk)
+
+
+def _write_chunks(pending, ordered):
+    """Write at least one serialized chunk, removing it from pending"""
+    if ordered:
+        future, f = pending.popitem(last=False)
+        f.write(future.result())
+    else:
+        done, _ = concurrent.futures.wait(
+            pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            pending.pop(future).write(future.result())
+
+
+def _count_vps(v):
+    """Number of vertex property ids assigned when exporting a vertex"""
+    count = 0
+    properties = v.__properties__
+    for db_name, (ogm_name, _) in v.__mapping__.db_properties.items():
+        prop = properties[ogm_name]
+        if isinstance(prop, VertexProperty):
+            prop = getattr(v, ogm_name)
+            if isinstance(prop, VertexPropertyManager):
+                count += len(prop)
+                continue
+        count += 1
+    return count
+
+
+def iterload(fpath, app, *, mode="r", compression="infer"):
+    """
+    Lazily convert a GraphSON adjacency list file to Goblin elements, one
+    line at a time. Element classes are looked up in the app registry.
+
+    :param fpath: Path to the file, or to a directory of part files, or a
+        text or binary file-like object
+    :param goblin.app.Goblin app: App with the registered element classes
+    :param str compression: One of 'gzip', 'bz2', 'xz', 'zstd' or `None`.
+        By default inferred from the file extension
+
+    :returns: Generator of :py:class:`AdjList` objects
+    """
+    if isinstance(fpath, str) and os.path.isdir(fpath):
+        for name in sorted(os.listdir(fpath)):
+            # Skip hidden files and markers such as _SUCCESS
+            if not name.startswith(('.', '_')):
+                yield from iterload(os.path.join(fpath, name), app,
+                                    mode=mode, compression=compression)
+        return
+    with _open_text(fpath, mode, compression) as f:
+        for line in f:
+            if line.strip():
+                yield loads(line, app)
+
+
+def load(fpath, app, *, mode="r", compression="infer"):
+    """
+    Convert a GraphSON adjacency list file to Goblin elements. Use
+    :py:func:`iterload` for large files.
+
+    :returns: `list` of :py:class:`AdjList` objects
+    """
+    return list(iterload(fpath, app, mode=mode, compression=compression))
+
+
+def loads(s, app):
+    """
+    Convert a GraphSON adjacency list line to Goblin elements. Uses the app's
+    JSON backend, if any.
+    """
+    json_backend = getattr(app, 'json_backend', None)
+    if json_backend is None:
+        json_backend = _exporter.json_backend
+    data = json_backend.loads(s)
+    vertex = _load_vertex(data, app)
+    inE = []
+    for label, edges in data.get("inE", {}).items():
+        for e in edges:
+            inE.append(_load_edge(e, label, vertex, "inV", app))
+    outE = []
+    for label, edges in data.get("outE", {}).items():
+        for e in edges:
+            outE.append(_load_edge(e, label, vertex, "outV", app))
+    return AdjList(vertex=vertex, inE=inE, outE=outE)
+
+
+def _load_vertex(data, app):
+    vid = reader.toObject(data["id"])
+    label = data["label"]
+    props = {"id": vid, "label": label}
+    for db_name, vps in data.get("properties", {}).items():
+        values = []
+        for vp in vps:
+            value = reader.toObject(vp["value"])
+            if value is None:
+                continue
+            metaprops = {
+                key: reader.toObject(val)
+                for key, val in vp.get("properties", {}).items()
+                if val is not None}
+            if metaprops:
+                metaprops.update(id=reader.toObject(vp["id"]), key=db_name,
+                                 value=value)
+                value = metaprops
+            values.append(value)
+        if values:
+            props[db_name] = values
+    element = app.vertices.get(label, GenericVertex)()
+    return element.__mapping__.mapper_func(
+        graph.Vertex(vid, label), props, element)
+
+
+def _load_edge(data, label, vertex, t, app):
+    eid = reader.toObject(data["id"])
+    props = {"id": eid, "label": label}
+    for db_name, val in data.get("properties", {}).items():
+        val = reader.toObject(val)
+        if val is not None:
+            props[db_name] = val
+    edge_class = app.edges.get(label, GenericEdge)
+    other = GenericVertex()
+    if t == "inV":
+        other.id = reader.toObject(data["outV"])
+        element = edge_class(other, vertex)
+    elif t == "outV":
+        other.id = reader.toObject(data["inV"])
+        element = edge_class(vertex, other)
+    else:
+        raise RuntimeError('Invalid edge type')
+    result = graph.Edge(eid, graph.Vertex(element.source.id), label,
+                        graph.Vertex(element.target.id))
+    return element.__mapping__.mapper_func(result, props, element)
 
 
 def _prep_edge(e, t):
@@ -62,66 +590,13 @@ def _prep_edge(e, t):
         },
         "properties": {}
     }
-    for db_name, (ogm_name, _) in e.__mapping__.db_properties.items():
-        edge["properties"][db_name] = writer.toDict(getattr(e, ogm_name))
+    for db_name, (ogm_name, data_type) in e.__mapping__.db_properties.items():
+        edge["properties"][db_name] = _value_writer(data_type)(
+            getattr(e, ogm_name))
 
     return edge
 
 
-def _prep_vertex(v):
-    global vp_id
-    mapping = v.__mapping__
-    properties = v.__properties__
-    vertex = {
-            "id": {
-                "@type": "g:Int32",
-                "@value": v.id
-            },
-            "label": v.__label__,
-            "properties": {},
-            "outE": {},
-            "inE": {}
-    }
-
-
-
-    for db_name, (ogm_name, _) in mapping.db_properties.items():
-        prop = properties[ogm_name]
-        vertex["properties"].setdefault(db_name, [])
-        if isinstance(prop, VertexProperty):
-            prop = getattr(v, ogm_name)
-            if isinstance(prop, ListVertexPropertyManager):
-                for p in prop:
-                    value = p.value
-                    vp = _prep_vp(p, value, v, db_name)
-                    vp_id += 1
-                    vertex["properties"][db_name].append(vp)
-                continue
-            else:
-                value = prop.value
-        else:
-            value = getattr(v, ogm_name)
-        vp = _prep_vp(prop, value, v, db_name)
-        vp_id += 1
-        vertex["properties"][db_name].append(vp)
-    return vertex
-
-
-def _prep_vp(prop, value, v, db_name):
-    vp = {
-            "id": {
-                "@type": "g:Int64",
-                "@value": vp_id
-            },
-            "value": writer.toDict(value),
-            "properties": {}
-    }
-    if isinstance(prop, VertexProperty):
-        for db_name, (ogm_name, _) in prop.__mapping__.db_properties.items():
-            vp["properties"][db_name] = writer.toDict(getattr(prop, ogm_name))
-    return vp
-
-
 
 def _dump_edge(e):
     pass
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Identity maps used by sessions to track loaded elements"""
+
+import collections
+import collections.abc
+import weakref
+
+
+class IdentityMap(collections.abc.MutableMapping):
+    """
+    Maps hashable element ids to the elements loaded or saved by a
+    :py:class:`Session<goblin.session.Session>`. Holds strong references to
+    all elements until they are expunged. Counts the hits and misses of
+    :py:meth:`lookup`, used by sessions when hydrating elements, which can be
+    used to size bounded identity maps.
+    """
+
+    def __init__(self):
+        self._elements = self._create_storage()
+        self._hits = 0
+        self._misses = 0
+
+    def _create_storage(self):
+        return dict()
+
+    @property
+    def hits(self):
+        """Number of lookups that found an element"""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of lookups that didn't find an element"""
+        return self._misses
+
+    def reset_stats(self):
+        """Reset hit and miss counters"""
+        self._hits = 0
+        self._misses = 0
+
+    def lookup(self, key):
+        """
+        Get the element tracked for a key, counting a hit or a miss.
+
+        :returns: :py:class:`Element<goblin.element.Element>` | None
+        """
+        try:
+            element = self[key]
+        except KeyError:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return element
+
+    def __getitem__(self, key):
+        return self._elements[key]
+
+    def __setitem__(self, key, element):
+        self._elements[key] = element
+
+    def __delitem__(self, key):
+        del self._elements[key]
+
+    def __contains__(self, key):
+        return key in self._elements
+
+    def __iter__(self):
+        return iter(list(self._elements))
+
+    def __len__(self):
+        return len(self._elements)
+
+    def expunge(self, element):
+        """
+        Stop tracking an element.
+
+        :param goblin.element.Element element: Element to be removed
+        """
+        for key, value in list(self._elements.items()):
+            if value is element:
+                del self._elements[key]
+
+    def __repr__(self):
+        return '<{}(size={}, hits={}, misses={})>'.format(
+            self.__class__.__name__, len(self), self._hits, self._misses)
+
+
+class WeakIdentityMap(IdentityMap):
+    """
+    Identity map that only holds weak references to elements, so elements
+    are evicted as soon as they are no longer referenced by application code.
+    """
+
+    def _create_storage(self):
+        return weakref.WeakValueDictionary()
+
+
+class LRUIdentityMap(IdentityMap):
+    """
+    Identity map holding at most `maxsize` elements, evicting the least
+    recently used element when full.
+
+    :param int maxsize: Maximum number of elements tracked
+    """
+
+    def __init__(self, maxsize=10000):
+        super().__init__()
+        self._maxsize = maxsize
+        self._evictions = 0
+
+    def _create_storage(self):
+        return collections.OrderedDict()
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def evictions(self):
+        """Number of elements evicted to make room for new ones"""
+        return self._evictions
+
+    def __getitem__(self, key):
+        element = self._elements[key]
+        self._elements.move_to_end(key)
+        return element
+
+    def __setitem__(self, key, element):
+        self._elements[key] = element
+        self._elements.move_to_end(key)
+        while len(self._elements) > self._maxsize:
+            self._elements.popitem(last=False)
+            self._evictions += 1
@@ -1,51 +1,221 @@
 """Managers for multi cardinality vertex properties"""
 
+import weakref
+
 
 class VertexPropertyManager:
+    """
+    Base class for multi cardinality vertex property containers. Keeps an
+    index from values to vertex properties. The manager counts changes to
+    its members and to their values, which its vertex properties report to
+    it, and rebuilds the index when it is out of date.
+    """
+
     def __init__(self, data_type, vertex_prop, card):
         self._data_type = data_type
         self._vertex_prop = vertex_prop
         self._card = card
-        self._mapper_func = vertex_prop.__mapping__.mapper_func
+        self._version = 0
+        self._value_version = 0
+        self._index = None
+        self._index_state = None
 
     @property
     def mapper_func(self):
-        return self._mapper_func
+        return self._vertex_prop.__mapping__.mapper_func
 
     def __call__(self, val):
-        results = []
-        for v in self:
-            if v.value == val:
-                results.append(v)
+        results = self._lookup(val)
         if len(results) == 1:
             results = results[0]
         elif not results:
             results = None
         return results
 
+    def _lookup(self, val):
+        index = self._get_index()
+        if index is not None:
+            try:
+                return list(index.get(val, ()))
+            except TypeError:
+                pass
+        return [v for v in self if v.value == val]
+
+    def _get_index(self):
+        if self._index_state != (self._version, self._value_version):
+            self._rebuild_index()
+        return self._index
+
+    def _rebuild_index(self):
+        index = {}
+        try:
+            for v in self:
+                index.setdefault(v.value, []).append(v)
+        except TypeError:
+            # Unhashable values, fall back to scanning
+            index = None
+        self._index = index
+        self._index_state = (self._version, self._value_version)
+
+    def _index_is_current(self):
+        return (self._index is not None and
+                self._index_state == (self._version, self._value_version))
+
+    def _adopt(self, vps):
+        """Register as an owner of vertex properties, see _value_changed"""
+        for vp in vps:
+            owners = getattr(vp, '_owners', None)
+            if owners is None:
+                continue
+            if not any(ref() is self for ref in owners):
+                vp._owners = owners + (weakref.ref(self),)
+
+    def _changed(self):
+        """Record a change to the members of the manager"""
+        self._version += 1
+
+    def _value_changed(self):
+        """Called by member vertex properties when their value changes"""
+        self._value_version += 1
+
+    def _index_add(self, vp):
+        """Add a new member, updating the index if it was current"""
+        current = self._index_is_current()
+        self._adopt([vp])
+        self._changed()
+        if current:
+            try:
+                self._index.setdefault(vp.value, []).append(vp)
+            except TypeError:
+                self._index = None
+            self._index_state = (self._version, self._value_version)
+
+    def _index_discard(self, vp):
+        """Remove a member, updating the index if it was current"""
+        current = self._index_is_current()
+        self._changed()
+        if current:
+            try:
+                vps = self._index.get(vp.value, [])
+            except TypeError:
+                vps = []
+            vps[:] = [v for v in vps if v is not vp]
+            self._index_state = (self._version, self._value_version)
+
+    def __reduce__(self):
+        # Rebuild from the vertex properties, the indexes are recreated lazily
+        return (self.__class__, (self._data_type, self._vertex_prop,
+                                 self._card, list(self)))
+
+    def _new_vertex_prop(self, val):
+        vp = self._vertex_prop(self._data_type, card=self._card)
+        vp.value = self._data_type.validate(val)
+        return vp
+
+
+def _changes_members(name, base, *, adopt=False):
+    """
+    Wrap a list or set method so that calling it counts as a change to the
+    members of the manager. If adopt is `True`, the method can add vertex
+    properties, which are registered with the manager.
+    """
+    method = getattr(base, name)
+
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if adopt:
+            self._adopt(self)
+        self._changed()
+        return result
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
 
 class ListVertexPropertyManager(list, VertexPropertyManager):
     def __init__(self, data_type, vertex_prop, card, obj):
         VertexPropertyManager.__init__(self, data_type, vertex_prop, card)
         list.__init__(self, obj)
+        self._adopt(self)
         self._vp_map = {}
+        self._vp_map_state = self._version
+
+    def __reduce__(self):
+        return (VertexPropertyManager.__reduce__(self) +
+                ({'_vp_map': self._vp_map},))
 
     @property
     def vp_map(self):
+        """Vertex properties by db id, pruned of removed vertex properties"""
+        if self._vp_map_state != self._version:
+            if self._vp_map:
+                members = {id(v) for v in self}
+                self._vp_map = {k: v for k, v in self._vp_map.items()
+                                if id(v) in members}
+            self._vp_map_state = self._version
         return self._vp_map
 
     def append(self, val):
-        vp = self._vertex_prop(self._data_type, card=self._card)
-        vp.value = self._data_type.validate(val)
+        vp = self._new_vertex_prop(val)
         super().append(vp)
+        # Appending doesn't make the pruned vp_map stale
+        vp_map_current = self._vp_map_state == self._version
+        self._index_add(vp)
+        if vp_map_current:
+            self._vp_map_state = self._version
+
+    def remove(self, vp):
+        super().remove(vp)
+        self._discard(vp)
+
+    def pop(self, i=-1):
+        vp = super().pop(i)
+        self._discard(vp)
+        return vp
+
+    def _discard(self, vp):
+        vp_map_current = self._vp_map_state == self._version
+        self._index_discard(vp)
+        if vp_map_current:
+            for k, v in list(self._vp_map.items()):
+                if v is vp:
+                    del self._vp_map[k]
+            self._vp_map_state = self._version
+
+    __setitem__ = _changes_members('__setitem__', list, adopt=True)
+    __iadd__ = _changes_members('__iadd__', list, adopt=True)
+    extend = _changes_members('extend', list, adopt=True)
+    insert = _changes_members('insert', list, adopt=True)
+    __delitem__ = _changes_members('__delitem__', list)
+    __imul__ = _changes_members('__imul__', list)
+    clear = _changes_members('clear', list)
+    sort = _changes_members('sort', list)
+    reverse = _changes_members('reverse', list)
 
 
 class SetVertexPropertyManager(set, VertexPropertyManager):
     def __init__(self, data_type, vertex_prop, card, obj):
         VertexPropertyManager.__init__(self, data_type, vertex_prop, card)
         set.__init__(self, obj)
+        self._adopt(self)
+
+    __reduce__ = VertexPropertyManager.__reduce__
 
     def add(self, val):
-        vp = self._vertex_prop(self._data_type, card=self._card)
-        vp.value = self._data_type.validate(val)
+        vp = self._new_vertex_prop(val)
         super().add(vp)
+        self._index_add(vp)
+
+    update = _changes_members('update', set, adopt=True)
+    symmetric_difference_update = _changes_members(
+        'symmetric_difference_update', set, adopt=True)
+    __ior__ = _changes_members('__ior__', set, adopt=True)
+    __ixor__ = _changes_members('__ixor__', set, adopt=True)
+    discard = _changes_members('discard', set)
+    remove = _changes_members('remove', set)
+    pop = _changes_members('pop', set)
+    clear = _changes_members('clear', set)
+    difference_update = _changes_members('difference_update', set)
+    intersection_update = _changes_members('intersection_update', set)
+    __iand__ = _changes_members('__iand__', set)
+    __isub__ = _changes_members('__isub__', set)
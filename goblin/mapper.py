@@ -1,15 +1,21 @@
 """Helper functions and class to map between OGM Elements <-> DB Elements"""
 
+import copy
 import functools
 import logging
 
+from gremlin_python.process.traversal import Cardinality
+
 from goblin import exception
+from goblin.properties import PropertyDescriptor
 
 logger = logging.getLogger(__name__)
 
 
 def map_props_to_db(element, mapping):
     """Convert OGM property names/values to DB property names/values"""
+    if mapping.props_to_db is not None:
+        return mapping.props_to_db(element)
     property_tuples = []
     props = mapping.ogm_properties
     for ogm_name, (db_name, data_type) in props.items():
@@ -32,7 +38,68 @@ def map_props_to_db(element, mapping):
     return property_tuples
 
 
+def _snapshot_value(val, copy_value):
+    if copy_value and not isinstance(val, (str, bytes, int, float)):
+        # Mutable values could be changed in place
+        return copy.deepcopy(val)
+    return val
+
+
+def _snapshot_entry(val, metaprops, copy_value):
+    if metaprops:
+        metaprops = {key: _snapshot_value(meta, copy_value)
+                     for key, meta in metaprops.items() if meta is not None}
+    return _snapshot_value(val, copy_value), metaprops or None
+
+
+def snapshot_props(props, *, copy_values=True):
+    """
+    Group the values and metaprops of property tuples returned by
+    :py:func:`map_props_to_db` by db name, leaving out unset values. Used to
+    detect which properties changed since an element was loaded. Values are
+    copied unless copy_values is `False`.
+    """
+    snapshot = {}
+    for card, db_name, val, metaprops in props:
+        if val is not None:
+            snapshot.setdefault(db_name, []).append(
+                _snapshot_entry(val, metaprops, copy_values))
+    return snapshot
+
+
+def snapshot_db_props(props, mapping, element_type):
+    """
+    Build a snapshot like :py:func:`snapshot_props` from the properties of
+    an element returned by the db, before they are mapped. Properties not
+    defined by the mapping are left out.
+    """
+    db_properties = mapping.db_properties
+    snapshot = {}
+    for db_name, value in props.items():
+        if db_name not in db_properties:
+            continue
+        if element_type != 'vertex':
+            if value is not None:
+                snapshot[db_name] = [_snapshot_entry(value, None, True)]
+            continue
+        entries = []
+        for v in value:
+            if isinstance(v, dict):
+                metaprops = {key: meta for key, meta in v.items()
+                             if key not in ('value', 'key', 'id')}
+                v = v['value']
+            else:
+                metaprops = None
+            if v is not None:
+                entries.append(_snapshot_entry(v, metaprops, True))
+        if entries:
+            snapshot[db_name] = entries
+    return snapshot
+
+
 def get_metaprops(vertex_property, mapping):
+    if mapping.props_to_db is not None:
+        return mapping.props_to_db(vertex_property)
     props = mapping.ogm_properties
     metaprops = {}
     for ogm_name, (db_name, data_type) in props.items():
@@ -46,31 +113,7 @@ def map_vertex_to_ogm(result, props, element, *, mapping=None):
     props.pop('id')
     label = props.pop('label')
     for db_name, value in props.items():
-        metaprops = []
-        if len(value) > 1:
-            values = []
-            for v in value:
-                if isinstance(v, dict):
-                    val = v.pop('value')
-                    v.pop('key')
-                    vid = v.pop('id')
-                    if v:
-                        v['id'] = vid
-                        metaprops.append((val, v))
-                    values.append(val)
-                else:
-                    values.append(v)
-            value = values
-        else:
-            value = value[0]
-            if isinstance(value, dict):
-                val = value.pop('value')
-                value.pop('key')
-                vid = value.pop('id')
-                if value:
-                    value['id'] = vid
-                    metaprops.append((val, value))
-                value = val
+        value, metaprops = _unpack_vertex_value(value)
         name, data_type = mapping.db_properties.get(db_name, (db_name, None))
         if data_type:
             value = data_type.to_ogm(value)
@@ -82,11 +125,345 @@ def map_vertex_to_ogm(result, props, element, *, mapping=None):
                 vert_prop.mapper_func(metaprops, vert_prop)
             else:
                 vert_prop.__mapping__.mapper_func(metaprops, vert_prop)
-    setattr(element, '__label__', label)
+    if element.__label__ != label:
+        setattr(element, '__label__', label)
     setattr(element, 'id', result.id)
     return element
 
 
+def _unpack_vertex_value(value):
+    """
+    Split the vertex property dicts returned for one key into the value(s)
+    and a list of (value, metaprops) pairs.
+    """
+    metaprops = []
+    if len(value) > 1:
+        values = []
+        for v in value:
+            if isinstance(v, dict):
+                val = v.pop('value')
+                v.pop('key')
+                vid = v.pop('id')
+                if v:
+                    v['id'] = vid
+                    metaprops.append((val, v))
+                values.append(val)
+            else:
+                values.append(v)
+        return values, metaprops
+    value = value[0]
+    if isinstance(value, dict):
+        val = value.pop('value')
+        value.pop('key')
+        vid = value.pop('id')
+        if value:
+            value['id'] = vid
+            metaprops.append((val, value))
+        value = val
+    return value, metaprops
+
+
+def _property_setter(name, prop):
+    """
+    Build a function that converts and sets a db value on an element. Writes
+    the instance attribute directly when the property uses the default
+    descriptor.
+    """
+    data_type = prop.data_type
+    to_ogm = data_type.to_ogm
+    if prop.__descriptor__ is PropertyDescriptor:
+        attr = '_' + name
+        validate = data_type.validate
+
+        def setter(element, value, metaprops):
+            setattr(element, attr, validate(to_ogm(value)))
+    elif hasattr(prop, '__mapping__'):
+        def setter(element, value, metaprops):
+            setattr(element, name, to_ogm(value))
+            if metaprops:
+                vert_prop = getattr(element, name)
+                if hasattr(vert_prop, 'mapper_func'):
+                    # Temporary hack for managers
+                    vert_prop.mapper_func(metaprops, vert_prop)
+                else:
+                    vert_prop.__mapping__.mapper_func(metaprops, vert_prop)
+    else:
+        def setter(element, value, metaprops):
+            setattr(element, name, to_ogm(value))
+    return setter
+
+
+def _split_vertex_value(v):
+    """Split one vertex property dict into its value and metaprops"""
+    if v.__class__ is not dict:
+        return v, None
+    metaprops = {key: val for key, val in v.items()
+                 if key not in ('value', 'key', 'id')}
+    if metaprops:
+        metaprops['id'] = v['id']
+    return v['value'], metaprops
+
+
+def _vertex_property_setter(name, prop):
+    """
+    Build a function that maps the db values of a single or list cardinality
+    vertex property, creating the vertex properties and their manager
+    directly. Returns `None` for other vertex properties.
+    """
+    # Imported here, goblin.element imports this module
+    from goblin.abc import DataType
+    from goblin.element import VertexPropertyDescriptor
+    from goblin.manager import ListVertexPropertyManager
+    data_type = prop.data_type
+    if (prop.__descriptor__ is not VertexPropertyDescriptor or
+            type(data_type).validate_vertex_prop is not
+            DataType.validate_vertex_prop):
+        return None
+    vp_class = prop.__class__
+    card = prop.cardinality
+    attr = '_' + name
+    to_ogm = data_type.to_ogm
+    validate = data_type.validate
+    db_properties = vp_class.__mapping__.db_properties
+
+    def set_metaprops(vp, metaprops):
+        for db_name, value in metaprops.items():
+            meta_name, meta_type = db_properties.get(db_name, (db_name, None))
+            if meta_type:
+                value = meta_type.to_ogm(value)
+            setattr(vp, meta_name, value)
+
+    if card == Cardinality.single:
+        def setter(element, value):
+            if len(value) != 1:
+                return False
+            val, metaprops = _split_vertex_value(value[0])
+            val = to_ogm(val)
+            if val is None:
+                return False
+            vp = vp_class(data_type)
+            vp.value = validate(val)
+            setattr(element, attr, vp)
+            if metaprops:
+                set_metaprops(vp, metaprops)
+            return True
+    elif card == Cardinality.list_:
+        def setter(element, value):
+            vals = []
+            vp_metaprops = []
+            for v in value:
+                val, metaprops = _split_vertex_value(v)
+                vals.append(val)
+                vp_metaprops.append(metaprops)
+            if len(vals) == 1:
+                vals = [to_ogm(vals[0])]
+            else:
+                vals = to_ogm(vals)
+            vps = []
+            for val in vals:
+                vp = vp_class(data_type, card=card)
+                vp.value = validate(val)
+                vps.append(vp)
+            vert_prop = ListVertexPropertyManager(data_type, vp_class, card,
+                                                  vps)
+            setattr(element, attr, vert_prop)
+            for vp, metaprops in zip(vps, vp_metaprops):
+                if metaprops:
+                    vert_prop.vp_map[get_hashable_id(metaprops['id'])] = vp
+                    set_metaprops(vp, metaprops)
+            return True
+    else:
+        return None
+    return setter
+
+
+def _vertex_setter(name, prop):
+    """
+    Build a function that unpacks the list of db values returned for a
+    vertex property key and sets it on an element, choosing how to unpack
+    when the mapper is compiled. Falls back to the generic unpacking for
+    unexpected shapes.
+    """
+    general = _property_setter(name, prop)
+
+    def fallback(element, value):
+        value, metaprops = _unpack_vertex_value(value)
+        general(element, value, metaprops)
+
+    if prop.__descriptor__ is PropertyDescriptor:
+        attr = '_' + name
+        to_ogm = prop.data_type.to_ogm
+        validate = prop.data_type.validate
+
+        def setter(element, value):
+            if len(value) == 1:
+                val = value[0]
+                if val.__class__ is not dict:
+                    setattr(element, attr, validate(to_ogm(val)))
+                    return
+            fallback(element, value)
+        return setter
+    if hasattr(prop, '__mapping__'):
+        vp_setter = _vertex_property_setter(name, prop)
+        if vp_setter is not None:
+            def setter(element, value):
+                if not vp_setter(element, value):
+                    fallback(element, value)
+            return setter
+    return fallback
+
+
+def _set_unmapped(element, db_name, value):
+    try:
+        setattr(element, db_name, value)
+    except AttributeError:
+        # Slotted element classes can't store undeclared properties
+        logger.warning('Ignoring unmapped property {} for {}'.format(
+            db_name, element.__class__.__name__))
+
+
+def _property_setters(mapping, properties):
+    setters = {}
+    for name, prop in properties.items():
+        if name == 'id':
+            continue
+        db_name, _ = mapping.ogm_properties[name]
+        setters[db_name] = _property_setter(name, prop)
+    return setters
+
+
+def compile_vertex_mapper(mapping, properties):
+    """
+    Generate a function equivalent to :py:func:`map_vertex_to_ogm` for one
+    vertex class, with the property lookups, value unpacking and data type
+    conversions resolved ahead of time.
+    """
+    setters = {}
+    for name, prop in properties.items():
+        if name == 'id':
+            continue
+        db_name, _ = mapping.ogm_properties[name]
+        setters[db_name] = _vertex_setter(name, prop)
+
+    def mapper_func(result, props, element):
+        props.pop('id')
+        label = props.pop('label')
+        for db_name, value in props.items():
+            setter = setters.get(db_name)
+            if setter is None:
+                value, _ = _unpack_vertex_value(value)
+                _set_unmapped(element, db_name, value)
+            else:
+                setter(element, value)
+        if element.__label__ != label:
+            element.__label__ = label
+        element.id = result.id
+        return element
+
+    return mapper_func
+
+
+def compile_edge_mapper(mapping, properties):
+    """
+    Generate a function equivalent to :py:func:`map_edge_to_ogm` for one
+    edge class, with the property lookups and data type conversions resolved
+    ahead of time.
+    """
+    setters = _property_setters(mapping, properties)
+
+    def mapper_func(result, props, element):
+        props.pop('id')
+        label = props.pop('label')
+        for db_name, value in props.items():
+            setter = setters.get(db_name)
+            if setter is None:
+                _set_unmapped(element, db_name, value)
+            else:
+                setter(element, value, None)
+        if element.__label__ != label:
+            element.__label__ = label
+        element.id = result.id
+        _map_edge_vertices(result, element)
+        return element
+
+    return mapper_func
+
+
+def _property_serializer(name, prop, db_name, data_type):
+    """
+    Build a function that appends the db property tuples for one property of
+    an element to a list.
+    """
+    to_db = data_type.to_db
+    if prop.__descriptor__ is PropertyDescriptor:
+        attr = '_' + name
+        default = prop.default
+
+        def serializer(element, property_tuples):
+            property_tuples.append(
+                (None, db_name, to_db(getattr(element, attr, default)), None))
+    else:
+        def serializer(element, property_tuples):
+            val = getattr(element, name, None)
+            if val and isinstance(val, (list, set)):
+                card = None
+                for v in val:
+                    metaprops = v.__mapping__.props_to_db(v)
+                    property_tuples.append(
+                        (card, db_name, to_db(v.value), metaprops))
+                    card = v.cardinality
+            elif hasattr(val, '__mapping__'):
+                metaprops = val.__mapping__.props_to_db(val)
+                property_tuples.append(
+                    (None, db_name, to_db(val.value), metaprops))
+            else:
+                property_tuples.append((None, db_name, to_db(val), None))
+    return serializer
+
+
+def compile_props_to_db(mapping, properties):
+    """
+    Generate a function equivalent to :py:func:`map_props_to_db` for one
+    vertex or edge class.
+    """
+    serializers = []
+    for name, prop in properties.items():
+        if name == 'id':
+            continue
+        db_name, data_type = mapping.ogm_properties[name]
+        serializers.append(
+            _property_serializer(name, prop, db_name, data_type))
+
+    def props_to_db(element):
+        property_tuples = []
+        for serializer in serializers:
+            serializer(element, property_tuples)
+        return property_tuples
+
+    return props_to_db
+
+
+def compile_metaprops_to_db(mapping, properties):
+    """
+    Generate a function equivalent to :py:func:`get_metaprops` for one
+    vertex property class.
+    """
+    getters = []
+    for name, prop in properties.items():
+        db_name, data_type = mapping.ogm_properties[name]
+        if prop.__descriptor__ is PropertyDescriptor:
+            getters.append((db_name, '_' + name, prop.default,
+                            data_type.to_db))
+        else:
+            getters.append((db_name, name, None, data_type.to_db))
+
+    def props_to_db(vertex_property):
+        return {db_name: to_db(getattr(vertex_property, attr, default))
+                for db_name, attr, default, to_db in getters}
+
+    return props_to_db
+
+
 # temp hack
 def get_hashable_id(val):
     # Use the value "as-is" by default.
@@ -132,8 +509,14 @@ def map_edge_to_ogm(result, props, element, *, mapping=None):
         if data_type:
             value = data_type.to_ogm(value)
         setattr(element, name, value)
-    setattr(element, '__label__', label)
+    if element.__label__ != label:
+        setattr(element, '__label__', label)
     setattr(element, 'id', result.id)
+    _map_edge_vertices(result, element)
+    return element
+
+
+def _map_edge_vertices(result, element):
     # Currently not included in graphson
     # setattr(element.source, '__label__', result.outV.label)
     # setattr(element.target, '__label__', result.inV.label)
@@ -149,7 +532,6 @@ def map_edge_to_ogm(result, props, element, *, mapping=None):
         element.target = GenericVertex()
     setattr(element.source, 'id', sid)
     setattr(element.target, 'id', tid)
-    return element
 
 
 def _check_id(rid, eid):
@@ -165,13 +547,18 @@ def create_mapping(namespace, properties):
     element_type = namespace['__type__']
     if element_type == 'vertex':
         mapping_func = map_vertex_to_ogm
-        mapping = Mapping(namespace, element_type, mapping_func, properties)
+        mapping = Mapping(namespace, element_type, mapping_func, properties,
+                          mapper_factory=compile_vertex_mapper,
+                          serializer_factory=compile_props_to_db)
     elif element_type == 'edge':
         mapping_func = map_edge_to_ogm
-        mapping = Mapping(namespace, element_type, mapping_func, properties)
+        mapping = Mapping(namespace, element_type, mapping_func, properties,
+                          mapper_factory=compile_edge_mapper,
+                          serializer_factory=compile_props_to_db)
     elif element_type == 'vertexproperty':
         mapping_func = map_vertex_property_to_ogm
-        mapping = Mapping(namespace, element_type, mapping_func, properties)
+        mapping = Mapping(namespace, element_type, mapping_func, properties,
+                          serializer_factory=compile_metaprops_to_db)
     else:
         mapping = None
     return mapping
@@ -181,15 +568,31 @@ class Mapping:
     """
     This class stores the information necessary to map between an OGM element
     and a DB element.
+
+    :param mapper_factory: Optional callable that takes the mapping and the
+        element class properties and returns a specialized mapper function,
+        used in place of `mapper_func`
+    :param serializer_factory: Optional callable that takes the mapping and
+        the element class properties and returns a function converting an
+        element to db property tuples (or a metaproperty dict, for vertex
+        properties)
     """
 
-    def __init__(self, namespace, element_type, mapper_func, properties):
+    def __init__(self, namespace, element_type, mapper_func, properties, *,
+                 mapper_factory=None, serializer_factory=None):
         self._label = namespace['__label__']
         self._element_type = element_type
-        self._mapper_func = functools.partial(mapper_func, mapping=self)
         self._db_properties = {}
         self._ogm_properties = {}
         self._map_properties(properties)
+        if mapper_factory:
+            self._mapper_func = mapper_factory(self, properties)
+        else:
+            self._mapper_func = functools.partial(mapper_func, mapping=self)
+        if serializer_factory:
+            self._props_to_db = serializer_factory(self, properties)
+        else:
+            self._props_to_db = None
 
     @property
     def label(self):
@@ -201,6 +604,14 @@ class Mapping:
         """Function responsible for mapping db results to ogm"""
         return self._mapper_func
 
+    @property
+    def props_to_db(self):
+        """
+        Function converting an element to db property tuples, or `None` if
+        not compiled
+        """
+        return self._props_to_db
+
     @property
     def db_properties(self):
         """A dictionary of property mappings"""
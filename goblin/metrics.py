@@ -0,0 +1,180 @@
+"""Counters and timers recording the work done by apps and sessions"""
+
+import collections
+import contextlib
+import importlib
+import time
+
+
+TimerStats = collections.namedtuple('TimerStats', 'count total max')
+TimerStats.__doc__ = """
+Statistics recorded by a timer.
+
+:ivar int count: Number of observations
+:ivar float total: Total time observed, in seconds
+:ivar float max: Longest time observed, in seconds
+"""
+
+
+class Metrics:
+    """
+    Registry of named counters and timers. Listeners are called with
+    `(kind, name, value)` for every update, `kind` being 'counter' or
+    'timer', and can be used to bridge the registry to a monitoring system
+    such as Prometheus. Updates are propagated to the parent registry, so
+    that an app's registry aggregates the metrics of its sessions.
+
+    Metric names used by Goblin:
+
+    * `round_trips.<kind>`, and timer `round_trip_time.<kind>`: traversals
+      submitted to the server. `kind` is one of 'submit' (user traversals),
+      'hydrate' (batched hydration), 'label' (hydration label lookup),
+      'properties' (property projection), 'add', 'upsert' (existence
+      check and write), 'update', 'drop', 'export' and 'internal' (other
+      traversals built by the session)
+    * `bytes_out`: size of the serialized requests sent to the server
+    * `elements_hydrated`: elements mapped from db results
+    * `identity_map.hits` and `identity_map.misses`: identity map lookups
+      made while hydrating elements
+
+    :param goblin.metrics.Metrics parent: Registry updates are propagated to
+    """
+
+    def __init__(self, *, parent=None):
+        self._parent = parent
+        self._counters = collections.Counter()
+        self._timers = {}
+        self._listeners = []
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def counters(self):
+        """Copy of the current counter values"""
+        return dict(self._counters)
+
+    @property
+    def timers(self):
+        """
+        Copy of the current timer values, as
+        :py:class:`TimerStats<goblin.metrics.TimerStats>`
+        """
+        return dict(self._timers)
+
+    def add_listener(self, listener):
+        """
+        Register a callable called with `(kind, name, value)` on each
+        update.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def incr(self, name, value=1):
+        """Increment a counter"""
+        self._counters[name] += value
+        for listener in self._listeners:
+            listener('counter', name, value)
+        if self._parent is not None:
+            self._parent.incr(name, value)
+
+    def observe(self, name, seconds):
+        """Record an observation of a timer"""
+        stats = self._timers.get(name)
+        if stats is None:
+            stats = TimerStats(1, seconds, seconds)
+        else:
+            stats = TimerStats(stats.count + 1, stats.total + seconds,
+                               max(stats.max, seconds))
+        self._timers[name] = stats
+        for listener in self._listeners:
+            listener('timer', name, seconds)
+        if self._parent is not None:
+            self._parent.observe(name, seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Context manager timing the enclosed block"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start)
+
+    def counter(self, name):
+        """:returns: `int` value of a counter"""
+        return self._counters[name]
+
+    def timer_stats(self, name):
+        """
+        :returns: :py:class:`TimerStats<goblin.metrics.TimerStats>` | None
+        """
+        return self._timers.get(name)
+
+    def reset(self):
+        """Reset all counters and timers, keeping listeners"""
+        self._counters.clear()
+        self._timers.clear()
+
+
+class MeteredMessageSerializer:
+    """
+    Message serializer wrapper counting the bytes of serialized requests.
+    Installed by :py:meth:`Goblin.open<goblin.app.Goblin.open>` when a
+    metrics registry is passed.
+
+    :param serializer: Message serializer class, instance or dotted path
+    :param goblin.metrics.Metrics metrics:
+    """
+
+    def __init__(self, serializer, metrics):
+        if isinstance(serializer, str):
+            module, _, name = serializer.rpartition('.')
+            serializer = getattr(importlib.import_module(module), name)
+        if isinstance(serializer, type):
+            serializer = serializer()
+        self._serializer = serializer
+        self._metrics = metrics
+
+    def serialize_message(self, request_id, request_message):
+        message = self._serializer.serialize_message(request_id,
+                                                     request_message)
+        self._metrics.incr('bytes_out', len(message))
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self._serializer, name)
+
+
+class InstrumentedRemote:
+    """
+    Remote connection wrapper counting and timing the traversals submitted
+    through it. Round trips are timed until the response ends.
+
+    :param remote_connection: Wrapped remote connection
+    :param goblin.metrics.Metrics metrics:
+    :param str kind: Kind of round trip, used in metric names
+    :param asyncio.BaseEventLoop loop:
+    """
+
+    def __init__(self, remote_connection, metrics, kind, loop):
+        self._remote_connection = remote_connection
+        self._metrics = metrics
+        self._kind = kind
+        self._loop = loop
+
+    async def submit(self, bytecode):
+        self._metrics.incr('round_trips.' + self._kind)
+        start = time.monotonic()
+        remote_traversal = await self._remote_connection.submit(bytecode)
+        self._loop.create_task(
+            self._observe(remote_traversal.traversers, start))
+        return remote_traversal
+
+    async def _observe(self, result_set, start):
+        await result_set.done.wait()
+        self._metrics.observe('round_trip_time.' + self._kind,
+                              time.monotonic() - start)
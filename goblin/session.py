@@ -2,7 +2,10 @@
 
 import asyncio
 import collections
+import functools
+import json
 import logging
+import os
 import weakref
 
 import aiogremlin
@@ -10,16 +13,207 @@ from aiogremlin.driver.protocol import Message
 from aiogremlin.driver.resultset import ResultSet
 from aiogremlin.process.graph_traversal import __
 from gremlin_python.driver.remote_connection import RemoteTraversal
-from gremlin_python.process.traversal import Binding, Cardinality, Traverser
+from gremlin_python.process.traversal import (
+    Binding, Bytecode, Cardinality, Order, P, T, Traverser)
 from gremlin_python.structure.graph import Edge, Vertex
 
-from goblin import exception, mapper
-from goblin.element import GenericEdge, GenericVertex, VertexProperty
+from goblin import exception, identity, mapper, properties
+from goblin import metrics as goblin_metrics
+from goblin import tracing
+from goblin.fileio import graphson
+from goblin.element import (
+    ElementProxy, GenericEdge, GenericVertex, VertexProperty)
 from goblin.manager import VertexPropertyManager
 
 logger = logging.getLogger(__name__)
 
 
+# Steps that emit vertices/edges, and steps that pass their input traversers
+# through without changing their type. Used to decide whether a traversal can
+# be rewritten to return fully projected elements.
+_VERTEX_STEPS = frozenset([
+    'V', 'addV', 'out', 'in', 'both', 'outV', 'inV', 'bothV', 'otherV'])
+_EDGE_STEPS = frozenset(['E', 'addE', 'outE', 'inE', 'bothE'])
+_PASSTHROUGH_STEPS = frozenset([
+    'has', 'hasLabel', 'hasId', 'hasKey', 'hasValue', 'hasNot', 'where',
+    'filter', 'and', 'or', 'not', 'is', 'limit', 'range', 'tail', 'skip',
+    'dedup', 'order', 'by', 'sample', 'coin', 'simplePath', 'cyclicPath',
+    'as', 'timeLimit', 'barrier', 'identity', 'sideEffect', 'aggregate',
+    'store', 'property', 'from', 'to'])
+
+
+def _result_type(bytecode):
+    """
+    Statically determine the type of elements emitted by a traversal.
+
+    :returns: 'vertex', 'edge' or `None` if the type can't be determined
+    """
+    for instruction in reversed(bytecode.step_instructions):
+        step = instruction[0]
+        if step in _VERTEX_STEPS:
+            return 'vertex'
+        if step in _EDGE_STEPS:
+            return 'edge'
+        if step not in _PASSTHROUGH_STEPS:
+            return None
+    return None
+
+
+def _vertex_properties_projection():
+    return __.properties() \
+             .project('id', 'key', 'value', 'meta') \
+             .by(__.id()).by(__.key()).by(__.value()) \
+             .by(__.valueMap())
+
+
+def _element_projection(element_type, traversal=__):
+    """
+    Projection that returns an element along with everything needed to map it
+    to the OGM. Appended to traversal if passed, else anonymous.
+    """
+    if element_type == 'vertex':
+        return traversal.project('element', 'label', 'properties') \
+                        .by(__.identity()).by(__.label()) \
+                        .by(_vertex_properties_projection().fold())
+    return traversal.project('element', 'properties') \
+                    .by(__.identity()).by(__.valueMap(True))
+
+
+def _projected_props(projection, element_type):
+    """
+    Unpack an element projection.
+
+    :returns: tuple (db element, mapper input)
+    """
+    obj = projection['element']
+    if element_type == 'vertex':
+        props = _build_vertex_props(obj.id, projection['label'],
+                                    projection['properties'])
+    else:
+        props = projection['properties']
+    return obj, props
+
+
+def _adjacency_projection(traversal):
+    """
+    Append a projection of each vertex with its properties and its incoming
+    and outgoing edges.
+    """
+    return traversal.project('element', 'label', 'properties', 'inE',
+                             'outE') \
+                    .by(__.identity()).by(__.label()) \
+                    .by(_vertex_properties_projection().fold()) \
+                    .by(_element_projection('edge', __.inE()).fold()) \
+                    .by(_element_projection('edge', __.outE()).fold())
+
+
+def _write_checkpoint(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _project_bytecode(bytecode, element_type):
+    """Copy bytecode, appending the element projection for element_type"""
+    projected = Bytecode(bytecode)
+    projected.bindings.update(bytecode.bindings)
+    projection = _element_projection(element_type)
+    projected.step_instructions.extend(projection.bytecode.step_instructions)
+    return projected
+
+
+def _build_vertex_props(vid, label, props):
+    """Build the mapper input from a vertex property projection"""
+    new_props = {'label': label, 'id': vid}
+    for prop in props:
+        key = prop['key']
+        val = prop['value']
+        meta = prop['meta']
+        new_props.setdefault(key, [])
+        if meta:
+            meta['key'] = key
+            meta['value'] = val
+            meta['id'] = prop['id']
+            val = meta
+
+        new_props[key].append(val)
+    return new_props
+
+
+def _add_property_steps(traversal, props, binding=0):
+    """
+    Append property steps for OGM property tuples to a traversal, binding
+    keys and values with names numbered from binding.
+
+    :returns: tuple (traversal, next binding number)
+    """
+    for card, db_name, val, metaprops in props:
+        if not metaprops:
+            metaprops = {}
+        if val is not None:
+            key = ('k' + str(binding), db_name)
+            val = ('v' + str(binding), val)
+            if card:
+                # Maybe use a dict here as a translator
+                if card == Cardinality.list_:
+                    card = Cardinality.list_
+                elif card == Cardinality.set_:
+                    card = Cardinality.set_
+                else:
+                    card = Cardinality.single
+                metas = [
+                    j
+                    for i in zip(metaprops.keys(), metaprops.values())
+                    for j in i
+                ]
+                traversal = traversal.property(card, key, val, *metas)
+            else:
+                metas = [
+                    j
+                    for i in zip(metaprops.keys(), metaprops.values())
+                    for j in i
+                ]
+                traversal = traversal.property(key, val, *metas)
+            binding += 1
+    return traversal, binding
+
+
+def _changed_props(elem, props):
+    """
+    Compare property tuples with the snapshot taken when an element was last
+    loaded or saved.
+
+    :returns: `set` of changed db property names, or `None` if the element
+        has no snapshot
+    """
+    snapshot = getattr(elem, '__snapshot__', None)
+    if snapshot is None:
+        return None
+    current = mapper.snapshot_props(props, copy_values=False)
+    keys = set(snapshot) | set(current)
+    return {key for key in keys if snapshot.get(key) != current.get(key)}
+
+
+def _edge_end(vertex, step_labels, binding):
+    """
+    Reference an edge source/target vertex from a batched creation traversal,
+    by step label if it is created by the same traversal, else by id.
+
+    :returns: tuple (step label or traversal, next binding number)
+    """
+    if vertex is None:
+        raise exception.ElementError(
+            "Edges require both source/target vertices")
+    if id(vertex) in step_labels:
+        return step_labels[id(vertex)], binding
+    if not hasattr(vertex, 'id'):
+        raise exception.ElementError(
+            "Edge vertices must be saved before, or with, the edge")
+    vid = Binding('b' + str(binding), vertex.id)
+    return __.V(vid), binding + 1
+
+
 def bindprop(element_class, ogm_name, val, *, binding=None):
     """
     Helper function for binding ogm properties/values to corresponding db
@@ -48,17 +242,66 @@ class Session:
 
     :param goblin.app.Goblin app:
     :param aiogremlin.driver.connection.Connection conn:
+    :param bool project_results: Rewrite submitted traversals that return
+        vertices or edges so that labels and properties come back in the
+        same response, instead of fetching them for each element
+    :param int batch_size: Maximum number of results buffered before the
+        elements among them are hydrated with a single query. Used when a
+        traversal isn't rewritten by `project_results`
+    :param float batch_window: Maximum time in seconds a partial batch waits
+        for more results before being hydrated. `None` waits until the batch
+        is full or the response ends
+    :param int max_inflight_hydrations: Maximum number of batches hydrated
+        concurrently for a single response
+    :param bool ordered_results: Whether results are returned in the order
+        they were received from the server. If `False`, batches are returned
+        as soon as they are hydrated
+    :param bool lazy: Return
+        :py:class:`ElementProxy<goblin.element.ElementProxy>` objects instead
+        of hydrated elements from traversals. Can be overridden per
+        traversal, see :py:meth:`traversal`
+    :param int flush_chunk_size: Maximum number of new elements created by a
+        single traversal when flushing the pending queue, and of proxies
+        loaded by one batch in :py:meth:`load_proxies`
+    :param goblin.identity.IdentityMap identity_map: Identity map used to
+        track loaded elements. Defaults to an unbounded
+        :py:class:`IdentityMap<goblin.identity.IdentityMap>`
+    :param goblin.metrics.Metrics metrics: Registry recording this session's
+        round trips. Defaults to a child of the app's registry, if the app
+        has one
+    :param goblin.tracing.Tracer tracer: Tracer notified of the traversals
+        submitted by this session. Defaults to the app's tracer
     """
 
-    def __init__(self, app, remote_connection, get_hashable_id):
+    def __init__(self, app, remote_connection, get_hashable_id, *,
+                 project_results=False, batch_size=1, batch_window=None,
+                 max_inflight_hydrations=1, ordered_results=True,
+                 lazy=False, flush_chunk_size=100, identity_map=None,
+                 metrics=None, tracer=None):
         self._app = app
         self._remote_connection = remote_connection
         self._loop = self._app._loop
         self._use_session = False
-        self._pending = collections.deque()
-        self._current = dict()
+        self._pending = collections.OrderedDict()
+        if identity_map is None:
+            identity_map = identity.IdentityMap()
+        self._current = identity_map
         self._get_hashable_id = get_hashable_id
         self._graph = aiogremlin.Graph()
+        self._project_results = project_results
+        self._batch_size = batch_size
+        self._batch_window = batch_window
+        self._max_inflight_hydrations = max_inflight_hydrations
+        self._ordered_results = ordered_results
+        self._lazy = lazy
+        self._proxies = weakref.WeakSet()
+        self._flush_chunk_size = flush_chunk_size
+        if metrics is None and app.metrics is not None:
+            metrics = goblin_metrics.Metrics(parent=app.metrics)
+        self._metrics = metrics
+        if tracer is None:
+            tracer = app.tracer
+        self._tracer = tracer
 
     @property
     def graph(self):
@@ -72,10 +315,40 @@ class Session:
     def remote_connection(self):
         return self._remote_connection
 
+    @property
+    def metrics(self):
+        """
+        :py:class:`Metrics<goblin.metrics.Metrics>` registry of this session,
+        or `None` if metrics are disabled
+        """
+        return self._metrics
+
+    @property
+    def tracer(self):
+        """
+        :py:class:`Tracer<goblin.tracing.Tracer>` of this session, or `None`
+        """
+        return self._tracer
+
     @property
     def current(self):
+        """Identity map of the elements loaded or saved by this session"""
         return self._current
 
+    def expunge(self, *elements):
+        """
+        Stop tracking elements in this session's identity map.
+
+        :param goblin.element.Element elements: Elements to be removed
+        """
+        for elem in elements:
+            if hasattr(elem, 'id'):
+                hashable_id = self._get_hashable_id(elem.id)
+                if self._current.get(hashable_id) is elem:
+                    del self._current[hashable_id]
+            else:
+                self._current.expunge(elem)
+
     async def __aenter__(self):
         return self
 
@@ -106,9 +379,27 @@ class Session:
         Traversal source for internal use. Uses undelying conn. Doesn't
         trigger complex deserailization.
         """
-        return self.graph.traversal().withRemote(self.remote_connection)
+        return self._source('internal', '_g')
 
-    def traversal(self, element_class=None):
+    def _source(self, kind, caller):
+        """
+        Traversal source for internal use, recording round trips as kind
+        when metrics or tracing are enabled. Traces name the caller.
+        """
+        return self.graph.traversal().withRemote(
+            self._instrumented_remote(kind, caller))
+
+    def _instrumented_remote(self, kind, caller):
+        remote = self.remote_connection
+        if self._metrics is not None:
+            remote = goblin_metrics.InstrumentedRemote(
+                remote, self._metrics, kind, self._loop)
+        if self._tracer is not None:
+            remote = tracing.TracedRemote(
+                remote, self._tracer, kind, caller, self._loop)
+        return remote
+
+    def traversal(self, element_class=None, *, lazy=None):
         """
         Generate a traversal using a user defined element class as a
         starting point.
@@ -116,10 +407,17 @@ class Session:
         :param goblin.element.Element element_class: An optional element
             class that will dictate the element type (vertex/edge) as well as
             the label for the traversal source
+        :param bool lazy: Return
+            :py:class:`ElementProxy<goblin.element.ElementProxy>` objects
+            instead of hydrated elements. Defaults to the session setting
 
         :returns: `aiogremlin.process.graph_traversal.AsyncGraphTraversal`
         """
-        traversal = self.graph.traversal().withRemote(self)
+        if lazy is None or lazy == self._lazy:
+            remote = self
+        else:
+            remote = _SessionRemote(self, lazy=lazy)
+        traversal = self.graph.traversal().withRemote(remote)
         if element_class:
             label = element_class.__mapping__.label
             if element_class.__type__ == 'vertex':
@@ -129,60 +427,209 @@ class Session:
             traversal = traversal.hasLabel(label)
         return traversal
 
-    async def submit(self, bytecode):
+    async def submit(self, bytecode, *, lazy=None):
         """
         Submit a query to the Gremiln Server.
 
         :param str gremlin: Gremlin script to submit to server.
         :param dict bindings: A mapping of bindings for Gremlin script.
+        :param bool lazy: Return proxies instead of hydrated elements.
+            Defaults to the session setting
 
         :returns:
             `gremlin_python.driver.remove_connection.RemoteTraversal`
             object
         """
         await self.flush()
-        remote_traversal = await self.remote_connection.submit(bytecode)
+        if lazy is None:
+            lazy = self._lazy
+        hydrate = self._hydrate_batch
+        if lazy:
+            hydrate = self._proxy_batch
+        elif self._project_results:
+            projected = _result_type(bytecode)
+            if projected:
+                bytecode = _project_bytecode(bytecode, projected)
+                hydrate = functools.partial(self._hydrate_projections,
+                                            element_type=projected)
+        remote = self._instrumented_remote('submit', 'submit')
+        remote_traversal = await remote.submit(bytecode)
         traversers = remote_traversal.traversers
         side_effects = remote_traversal.side_effects
         result_set = ResultSet(traversers.request_id, traversers._timeout,
                                self._loop)
-        self._loop.create_task(self._receive(traversers, result_set))
+        self._loop.create_task(self._receive(traversers, result_set, hydrate))
         return RemoteTraversal(result_set, side_effects)
 
-    async def _receive(self, traversers, result_set):
+    async def _receive(self, traversers, result_set, hydrate):
+        batch = []
+        pending = None
+        inflight = collections.deque()
         try:
-            async for result in traversers:
-                result = await self._deserialize_result(result)
-                msg = Message(200, result, '')
-                result_set.queue_result(msg)
+            while True:
+                if self._batch_window and batch:
+                    if pending is None:
+                        pending = self._loop.create_task(
+                            traversers.__anext__())
+                    done, _ = await asyncio.wait(
+                        [pending], timeout=self._batch_window)
+                    if not done:
+                        # Window elapsed, hydrate what we have so far
+                        await self._dispatch_batch(batch, inflight,
+                                                   result_set, hydrate)
+                        batch = []
+                        continue
+                next_result = pending or traversers.__anext__()
+                pending = None
+                try:
+                    result = await next_result
+                except StopAsyncIteration:
+                    break
+                batch.append(result)
+                if len(batch) >= self._batch_size:
+                    await self._dispatch_batch(batch, inflight, result_set,
+                                               hydrate)
+                    batch = []
+            await self._dispatch_batch(batch, inflight, result_set, hydrate)
+            await self._drain_batches(inflight, result_set)
         except Exception as e:
+            if pending is not None:
+                pending.cancel()
+            for task in inflight:
+                task.cancel()
             msg = Message(500, None, e.args[0])
             result_set.queue_result(msg)
         finally:
             result_set.queue_result(None)
 
+    async def _dispatch_batch(self, batch, inflight, result_set, hydrate):
+        """
+        Schedule hydration of a batch, waiting for earlier batches if too many
+        are already in flight.
+        """
+        if batch:
+            inflight.append(self._loop.create_task(hydrate(batch)))
+        await self._drain_batches(inflight, result_set,
+                                  self._max_inflight_hydrations - 1)
+
+    async def _drain_batches(self, inflight, result_set, limit=0):
+        """Queue hydrated batches until at most limit are left in flight"""
+        while len(inflight) > limit:
+            if self._ordered_results:
+                done = [inflight.popleft()]
+            else:
+                done, _ = await asyncio.wait(
+                    inflight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    inflight.remove(task)
+            for task in done:
+                for result in await task:
+                    msg = Message(200, result, '')
+                    result_set.queue_result(msg)
+
+    async def _hydrate_projections(self, batch, *, element_type):
+        return [
+            self._deserialize_projection(result, element_type)
+            for result in batch
+        ]
+
+    async def _proxy_batch(self, batch):
+        """Wrap the elements in a batch with unloaded proxies"""
+        results = []
+        for result in batch:
+            obj = getattr(result, 'object', None)
+            if isinstance(obj, (Vertex, Edge)):
+                current = self.current.get(self._get_hashable_id(obj.id))
+                proxy = ElementProxy(self, obj, element=current)
+                if current is None:
+                    self._proxies.add(proxy)
+                result = Traverser(proxy, result.bulk)
+            results.append(result)
+        return results
+
+    async def load_proxies(self, *proxies):
+        """
+        Hydrate element proxies with batches of queries, loading up to
+        `flush_chunk_size` proxies per batch. Along with the proxies passed,
+        all of the unloaded proxies created by this session are loaded.
+
+        :param goblin.element.ElementProxy proxies: Proxies to be loaded
+        """
+        proxies = set(proxies)
+        proxies.update(self._proxies)
+        proxies = [proxy for proxy in proxies if not proxy.loaded]
+        if not proxies:
+            return
+        for i in range(0, len(proxies), self._flush_chunk_size):
+            chunk = proxies[i:i + self._flush_chunk_size]
+            batch = [Traverser(proxy.obj, 1) for proxy in chunk]
+            results = await self._hydrate_batch(batch)
+            for proxy, result in zip(chunk, results):
+                proxy.element = result.object
+                self._proxies.discard(proxy)
+
+    async def _hydrate_batch(self, results):
+        """
+        Hydrate all of the vertices and edges found in a batch of results
+        using one query per element type.
+        """
+        vids = collections.OrderedDict()
+        eids = collections.OrderedDict()
+        for result in results:
+            obj = getattr(result, 'object', None)
+            if isinstance(obj, Vertex):
+                vids[self._get_hashable_id(obj.id)] = obj
+            elif isinstance(obj, Edge):
+                eids[self._get_hashable_id(obj.id)] = obj
+        props = {}
+        if vids:
+            ids = [obj.id for obj in vids.values()]
+            source = self._source('hydrate', '_hydrate_batch')
+            projections = await source.V(*ids) \
+                .project('id', 'label', 'properties') \
+                .by(__.id()).by(__.label()) \
+                .by(_vertex_properties_projection().fold()).toList()
+            for projection in projections:
+                vid = projection['id']
+                props[self._get_hashable_id(vid)] = _build_vertex_props(
+                    vid, projection['label'], projection['properties'])
+        if eids:
+            ids = [obj.id for obj in eids.values()]
+            source = self._source('hydrate', '_hydrate_batch')
+            value_maps = await source.E(*ids).valueMap(True).toList()
+            for value_map in value_maps:
+                props[self._get_hashable_id(value_map['id'])] = value_map
+        hydrated = {}
+        for hashable_id, obj in list(vids.items()) + list(eids.items()):
+            if hashable_id in props:
+                hydrated[hashable_id] = self._hydrate(obj, props[hashable_id])
+        deserialized = []
+        for result in results:
+            obj = getattr(result, 'object', None)
+            if isinstance(obj, (Vertex, Edge)):
+                hashable_id = self._get_hashable_id(obj.id)
+                if hashable_id in hydrated:
+                    deserialized.append(
+                        Traverser(hydrated[hashable_id], result.bulk))
+                    continue
+            deserialized.append(await self._deserialize_result(result))
+        return deserialized
+
     async def _deserialize_result(self, result):
         if isinstance(result, Traverser):
             bulk = result.bulk
             obj = result.object
             if isinstance(obj, (Vertex, Edge)):
-                hashable_id = self._get_hashable_id(obj.id)
-                current = self.current.get(hashable_id, None)
                 if isinstance(obj, Vertex):
                     # why doesn't this come in on the vertex?
-                    label = await self._g.V(obj.id).label().next()
-                    if not current:
-                        current = self.app.vertices.get(label, GenericVertex)()
+                    source = self._source('label', '_deserialize_result')
+                    label = await source.V(obj.id).label().next()
                     props = await self._get_vertex_properties(obj.id, label)
                 if isinstance(obj, Edge):
-                    props = await self._g.E(obj.id).valueMap(True).next()
-                    if not current:
-                        current = self.app.edges.get(
-                            props.get('label'), GenericEdge)()
-                        current.source = GenericVertex()
-                        current.target = GenericVertex()
-                element = current.__mapping__.mapper_func(obj, props, current)
-                self.current[hashable_id] = element
+                    source = self._source('properties',
+                                          '_deserialize_result')
+                    props = await source.E(obj.id).valueMap(True).next()
+                element = self._hydrate(obj, props)
                 return Traverser(element, bulk)
             else:
                 return result
@@ -196,46 +643,164 @@ class Session:
         else:
             return result
 
+    def _deserialize_projection(self, result, element_type):
+        """Map a result of a traversal rewritten by _project_bytecode"""
+        obj, props = _projected_props(result.object, element_type)
+        return Traverser(self._hydrate(obj, props), result.bulk)
+
+    def _hydrate(self, obj, props, *, track=True):
+        """
+        Map a db element and its properties to the OGM element tracked by
+        this session, creating it if necessary. If track is `False`, a new
+        element is always created and not added to the identity map.
+        """
+        hashable_id = self._get_hashable_id(obj.id)
+        current = None
+        if track:
+            current = self.current.lookup(hashable_id)
+            if self._metrics is not None:
+                if current is None:
+                    self._metrics.incr('identity_map.misses')
+                else:
+                    self._metrics.incr('identity_map.hits')
+        if not current:
+            if isinstance(obj, Vertex):
+                current = self.app.vertices.get(props['label'],
+                                                GenericVertex)()
+            else:
+                current = self.app.edges.get(props.get('label'),
+                                             GenericEdge)()
+                current.source = GenericVertex()
+                current.target = GenericVertex()
+        if track:
+            # Taken from the db props, the element can have unsaved changes
+            snapshot = mapper.snapshot_db_props(
+                props, current.__mapping__,
+                'vertex' if isinstance(obj, Vertex) else 'edge')
+        element = current.__mapping__.mapper_func(obj, props, current)
+        if self._metrics is not None:
+            self._metrics.incr('elements_hydrated')
+        if track:
+            element.__snapshot__ = snapshot
+            self.current[hashable_id] = element
+        return element
+
+    def _take_snapshot(self, element, props=None):
+        """Record db property values, used to send only changed properties"""
+        if props is None:
+            props = mapper.map_props_to_db(element, element.__mapping__)
+        element.__snapshot__ = mapper.snapshot_props(props)
+
     async def _get_vertex_properties(self, vid, label):
-        projection = self._g.V(vid).properties() \
-                            .project('id', 'key', 'value', 'meta') \
-                            .by(__.id()).by(__.key()).by(__.value()) \
-                            .by(__.valueMap())
+        source = self._source('properties', '_get_vertex_properties')
+        projection = source.V(vid).properties() \
+                   .project('id', 'key', 'value', 'meta') \
+                   .by(__.id()).by(__.key()).by(__.value()) \
+                   .by(__.valueMap())
         props = await projection.toList()
-        new_props = {'label': label, 'id': vid}
-        for prop in props:
-            key = prop['key']
-            val = prop['value']
-            # print('val_type', type(val))
-            meta = prop['meta']
-            new_props.setdefault(key, [])
-            if meta:
-                meta['key'] = key
-                meta['value'] = val
-                meta['id'] = prop['id']
-                val = meta
-
-            new_props[key].append(val)
-        return new_props
+        return _build_vertex_props(vid, label, props)
 
     # Creation API
     def add(self, *elements):
         """
-        Add elements to session pending queue.
+        Add elements to session pending queue. Elements already in the
+        queue keep their position.
 
         :param goblin.element.Element elements: Elements to be added
         """
         for elem in elements:
-            self._pending.append(elem)
+            self._pending.setdefault(id(elem), elem)
 
     async def flush(self):
         """
         Issue creation/update queries to database for all elements in the
-        session pending queue.
+        session pending queue. Consecutive new elements are created together,
+        using one traversal per `flush_chunk_size` elements. If a traversal
+        fails, the elements that weren't written are put back at the front
+        of the queue.
+
+        :returns: `list` of the ids of the flushed elements, in queue order
         """
-        while self._pending:
-            elem = self._pending.popleft()
-            await self.save(elem)
+        ids = []
+        chunk = []
+        saving = None
+        try:
+            while self._pending:
+                _, elem = self._pending.popitem(last=False)
+                if hasattr(elem, 'id'):
+                    saving = elem
+                    ids.extend(await self._create_chunk(chunk))
+                    chunk = []
+                    result = await self.save(elem)
+                    saving = None
+                    ids.append(result.id)
+                else:
+                    chunk.append(elem)
+                    if len(chunk) >= self._flush_chunk_size:
+                        ids.extend(await self._create_chunk(chunk))
+                        chunk = []
+            ids.extend(await self._create_chunk(chunk))
+        except BaseException:
+            unflushed = chunk
+            if saving is not None:
+                unflushed.append(saving)
+            for elem in reversed(unflushed):
+                self._pending[id(elem)] = elem
+                self._pending.move_to_end(id(elem), last=False)
+            raise
+        return ids
+
+    async def _create_chunk(self, chunk, *, track=True):
+        """
+        Create new elements with a single traversal, chaining addV/addE steps
+        labeled so that edges can reference vertices created in the same
+        chunk. Unless track is `False`, the created elements are added to the
+        identity map.
+
+        :returns: `list` of the ids assigned to the elements
+        """
+        if not chunk:
+            return []
+        traversal = None
+        step_labels = {}
+        chunk_props = []
+        binding = 0
+        for elem in chunk:
+            step_label = 'e{}'.format(len(step_labels))
+            props = mapper.map_props_to_db(elem, elem.__mapping__)
+            chunk_props.append(props)
+            if elem.__type__ == 'vertex':
+                if traversal is None:
+                    traversal = self._source('add', '_create_chunk')
+                traversal = traversal.addV(elem.__mapping__.label)
+            elif elem.__type__ == 'edge':
+                if traversal is None:
+                    traversal = self._source('add', '_create_chunk').inject(0)
+                source, binding = _edge_end(
+                    getattr(elem, 'source', None), step_labels, binding)
+                target, binding = _edge_end(
+                    getattr(elem, 'target', None), step_labels, binding)
+                traversal = traversal.addE(elem.__mapping__.label) \
+                                     .from_(source).to(target)
+            else:
+                raise exception.ElementError(
+                    "Unknown element type: {}".format(elem.__type__))
+            traversal, binding = _add_property_steps(traversal, props,
+                                                     binding)
+            traversal = traversal.as_(step_label)
+            step_labels[id(elem)] = step_label
+        if len(chunk) == 1:
+            ids = [await traversal.id().next()]
+        else:
+            labels = [step_labels[id(elem)] for elem in chunk]
+            result = await traversal.select(*labels).by(__.id()).next()
+            ids = [result[label] for label in labels]
+        for elem, props, eid in zip(chunk, chunk_props, ids):
+            elem.id = eid
+            if track:
+                self._take_snapshot(elem, props)
+                self.current[self._get_hashable_id(elem.id)] = elem
+        return [elem.id for elem in chunk]
 
     async def remove_vertex(self, vertex):
         """
@@ -243,7 +808,8 @@ class Session:
 
         :param goblin.element.Vertex vertex: Vertex to be removed
         """
-        traversal = self._g.V(Binding('vid', vertex.id)).drop()
+        traversal = self._source('drop', 'remove_vertex').V(
+            Binding('vid', vertex.id)).drop()
         result = await self._simple_traversal(traversal, vertex)
         hashable_id = self._get_hashable_id(vertex.id)
         if hashable_id in self.current:
@@ -264,7 +830,7 @@ class Session:
         eid = edge.id
         if isinstance(eid, dict):
             eid = Binding('eid', edge.id)
-        traversal = self._g.E(eid).drop()
+        traversal = self._source('drop', 'remove_edge').E(eid).drop()
         result = await self._simple_traversal(traversal, edge)
         hashable_id = self._get_hashable_id(edge.id)
         if hashable_id in self.current:
@@ -276,50 +842,58 @@ class Session:
         del edge
         return result
 
-    async def save(self, elem):
+    async def save(self, elem, *, refresh=True):
         """
         Save an element to the db.
 
         :param goblin.element.Element element: Vertex or Edge to be saved
+        :param bool refresh: Map the element's properties as stored in the db
+            back onto it. If `False`, only the element id is set
 
         :returns: :py:class:`Element<goblin.element.Element>` object
         """
         if elem.__type__ == 'vertex':
-            result = await self.save_vertex(elem)
+            result = await self.save_vertex(elem, refresh=refresh)
         elif elem.__type__ == 'edge':
-            result = await self.save_edge(elem)
+            result = await self.save_edge(elem, refresh=refresh)
         else:
             raise exception.ElementError("Unknown element type: {}".format(
                 elem.__type__))
         return result
 
-    async def save_vertex(self, vertex):
+    async def save_vertex(self, vertex, *, refresh=True):
         """
         Save a vertex to the db.
 
         :param goblin.element.Vertex element: Vertex to be saved
+        :param bool refresh: Map the vertex properties as stored in the db
+            back onto it. If `False`, only the vertex id is set
 
         :returns: :py:class:`Vertex<goblin.element.Vertex>` object
         """
         result = await self._save_element(
-            vertex, self._check_vertex, self._add_vertex, self._update_vertex)
+            vertex, self._upsert_vertex, self._add_vertex, self._update_vertex,
+            refresh)
         hashable_id = self._get_hashable_id(result.id)
         self.current[hashable_id] = result
         return result
 
-    async def save_edge(self, edge):
+    async def save_edge(self, edge, *, refresh=True):
         """
         Save an edge to the db.
 
         :param goblin.element.Edge element: Edge to be saved
+        :param bool refresh: Map the edge properties as stored in the db back
+            onto it. If `False`, only the edge id is set
 
         :returns: :py:class:`Edge<goblin.element.Edge>` object
         """
         if not (hasattr(edge, 'source') and hasattr(edge, 'target')):
             raise exception.ElementError(
                 "Edges require both source/target vertices")
-        result = await self._save_element(edge, self._check_edge,
-                                          self._add_edge, self._update_edge)
+        result = await self._save_element(edge, self._upsert_edge,
+                                          self._add_edge, self._update_edge,
+                                          refresh)
         hashable_id = self._get_hashable_id(result.id)
         self.current[hashable_id] = result
         return result
@@ -347,7 +921,93 @@ class Session:
             eid = Binding('eid', edge.id)
         return await self.g.E(eid).next()
 
-    async def _update_vertex(self, vertex):
+    async def export_graphson(self, path, label=None, *, page_size=1000,
+                              checkpoint=None, exporter=None):
+        """
+        Export vertices and their edges to a GraphSON adjacency list file.
+        Vertices are fetched page by page in id order, each page starting
+        after the last id of the previous one, and each vertex is projected
+        with its properties and edges, so memory use is bounded by the page
+        size. Vertex ids must be orderable by the graph.
+
+        :param str path: Output file
+        :param str label: Only export vertices with this label
+        :param int page_size: Number of vertices fetched per query
+        :param str checkpoint: Optional file used to record progress after
+            each page. If it exists when the export starts, the export
+            resumes after the last completed page, unless the output file
+            is missing or shorter than recorded, in which case the export
+            starts over. It is removed when the export completes
+        :param goblin.fileio.graphson.GraphSONExporter exporter: Exporter
+            used to write the file
+
+        :returns: `int` number of vertices exported
+        """
+        state = None
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state = json.load(f)
+            if (not os.path.exists(path) or
+                    os.path.getsize(path) < state['position']):
+                logger.warning(
+                    'Output %s does not match checkpoint %s, restarting '
+                    'export', path, checkpoint)
+                state = None
+        count = 0
+        position = 0
+        last_id = None
+        if state:
+            count = state['count']
+            position = state['position']
+            # JSON loses the long type of ids, needed for 64 bit ids
+            last_id = properties.default_id_serializer(state['last_id'])
+        if exporter is None:
+            start = state['vp_id'] if state else 10
+            exporter = graphson.GraphSONExporter(
+                start=start, json_backend=self._app.json_backend)
+        mode = 'r+b' if state else 'wb'
+        with open(path, mode) as f:
+            f.seek(position)
+            f.truncate()
+            while True:
+                traversal = self._source('export', 'export_graphson').V()
+                if label:
+                    traversal = traversal.hasLabel(label)
+                if last_id is not None:
+                    traversal = traversal.has(T.id, P.gt(last_id))
+                traversal = traversal.order().by(T.id, Order.incr) \
+                                     .limit(page_size)
+                page = await _adjacency_projection(traversal).toList()
+                for projection in page:
+                    adj_list = self._build_adj_list(projection)
+                    f.write(exporter.dumps(adj_list).encode('utf-8') + b'\n')
+                count += len(page)
+                if page:
+                    last_id = page[-1]['element'].id
+                if checkpoint and page:
+                    f.flush()
+                    _write_checkpoint(checkpoint, {
+                        'count': count,
+                        'last_id': last_id,
+                        'position': f.tell(),
+                        'vp_id': exporter.id_allocator.next})
+                if len(page) < page_size:
+                    break
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return count
+
+    def _build_adj_list(self, projection):
+        obj, props = _projected_props(projection, 'vertex')
+        vertex = self._hydrate(obj, props, track=False)
+        edges = {}
+        for direction in ('inE', 'outE'):
+            edges[direction] = [
+                self._hydrate(*_projected_props(edge, 'edge'), track=False)
+                for edge in projection[direction]]
+        return graphson.AdjList(vertex=vertex, **edges)
+
+    async def _update_vertex(self, vertex, *, refresh=True):
         """
         Update a vertex, generally to change/remove property values.
 
@@ -356,10 +1016,12 @@ class Session:
         :returns: :py:class:`Vertex<goblin.element.Vertex>` object
         """
         props = mapper.map_props_to_db(vertex, vertex.__mapping__)
-        traversal = self._g.V(Binding('vid', vertex.id))
-        return await self._update_vertex_properties(vertex, traversal, props)
+        traversal = self._source('update', '_update_vertex').V(
+            Binding('vid', vertex.id))
+        return await self._update_properties(vertex, traversal, props,
+                                             refresh)
 
-    async def _update_edge(self, edge):
+    async def _update_edge(self, edge, *, refresh=True):
         """
         Update an edge, generally to change/remove property values.
 
@@ -371,96 +1033,128 @@ class Session:
         eid = edge.id
         if isinstance(eid, dict):
             eid = Binding('eid', edge.id)
-        traversal = self._g.E(eid)
-        return await self._update_edge_properties(edge, traversal, props)
+        traversal = self._source('update', '_update_edge').E(eid)
+        return await self._update_properties(edge, traversal, props, refresh)
 
     # *metodos especiales privados for creation API
 
-    async def _simple_traversal(self, traversal, element):
-        elem = await traversal.next()
-        if elem:
-            if element.__type__ == 'vertex':
-                # Look into this
-                label = await self._g.V(elem.id).label().next()
-                props = await self._get_vertex_properties(elem.id, label)
-            elif element.__type__ == 'edge':
-                props = await self._g.E(elem.id).valueMap(True).next()
-            elem = element.__mapping__.mapper_func(elem, props, element)
+    async def _simple_traversal(self, traversal, element, refresh=True):
+        """
+        Run a write traversal. Unless refresh is `False`, the traversal ends
+        with a projection of the written element, which is mapped back onto
+        element without further queries.
+        """
+        if not refresh:
+            eid = await traversal.id().next()
+            if eid is None:
+                return None
+            element.id = eid
+            self._take_snapshot(element)
+            return element
+        element_type = element.__type__
+        projection = await _element_projection(element_type,
+                                               traversal).next()
+        if not projection:
+            return None
+        obj, props = _projected_props(projection, element_type)
+        snapshot = mapper.snapshot_db_props(props, element.__mapping__,
+                                            element_type)
+        elem = element.__mapping__.mapper_func(obj, props, element)
+        elem.__snapshot__ = snapshot
         return elem
 
-    async def _save_element(self, elem, check_func, create_func, update_func):
+    async def _save_element(self, elem, upsert_func, create_func,
+                            update_func, refresh=True):
         if hasattr(elem, 'id'):
-            exists = await check_func(elem)
-            if not exists:
-                result = await create_func(elem)
+            # Elements loaded or saved by this session are known to exist
+            hashable_id = self._get_hashable_id(elem.id)
+            if self.current.get(hashable_id) is elem:
+                result = await update_func(elem, refresh=refresh)
+                if result is None:
+                    # Removed from the db since it was loaded, recreate it
+                    del self.current[hashable_id]
+                    result = await upsert_func(elem, refresh=refresh)
             else:
-                result = await update_func(elem)
+                result = await upsert_func(elem, refresh=refresh)
         else:
-            result = await create_func(elem)
+            result = await create_func(elem, refresh=refresh)
+        if result is None:
+            raise exception.ElementError(
+                "Element {} could not be saved".format(elem))
         return result
 
-    async def _add_vertex(self, vertex):
+    async def _add_vertex(self, vertex, *, refresh=True):
         """Convenience function for generating crud traversals."""
         props = mapper.map_props_to_db(vertex, vertex.__mapping__)
-        traversal = self._g.addV(vertex.__mapping__.label)
-        return await self._add_properties(traversal, props, vertex)
+        traversal = self._source('add', '_add_vertex').addV(
+            vertex.__mapping__.label)
+        return await self._add_properties(traversal, props, vertex, refresh)
 
-    async def _add_edge(self, edge):
+    async def _add_edge(self, edge, *, refresh=True):
         """Convenience function for generating crud traversals."""
         props = mapper.map_props_to_db(edge, edge.__mapping__)
-        traversal = self._g.V(Binding('sid', edge.source.id))
+        traversal = self._source('add', '_add_edge').V(
+            Binding('sid', edge.source.id))
         traversal = traversal.addE(edge.__mapping__._label)
         traversal = traversal.to(__.V(Binding('tid', edge.target.id)))
-        return await self._add_properties(traversal, props, edge)
+        return await self._add_properties(traversal, props, edge, refresh)
 
-    async def _check_vertex(self, vertex):
-        """Used to check for existence, does not update session vertex"""
-        msg = await self._g.V(Binding('vid', vertex.id)).next()
-        return msg
+    async def _upsert_vertex(self, vertex, *, refresh=True):
+        """
+        Update a vertex of unknown provenance, creating it if it doesn't exist,
+        with a single traversal.
+        """
+        props = mapper.map_props_to_db(vertex, vertex.__mapping__)
+        traversal = self._source('upsert', '_upsert_vertex').V(
+            Binding('vid', vertex.id)).fold().coalesce(
+            __.unfold(), __.addV(vertex.__mapping__.label))
+        traversal = traversal.sideEffect(__.properties().drop())
+        return await self._add_properties(traversal, props, vertex, refresh)
 
-    async def _check_edge(self, edge):
-        """Used to check for existence, does not update session edge"""
+    async def _upsert_edge(self, edge, *, refresh=True):
+        """
+        Update an edge of unknown provenance, creating it if it doesn't exist,
+        with a single traversal.
+        """
+        props = mapper.map_props_to_db(edge, edge.__mapping__)
         eid = edge.id
         if isinstance(eid, dict):
             eid = Binding('eid', edge.id)
-        return await self._g.E(eid).next()
+        create = __.V(Binding('sid', edge.source.id)) \
+                   .addE(edge.__mapping__.label) \
+                   .to(__.V(Binding('tid', edge.target.id)))
+        traversal = self._source('upsert', '_upsert_edge').E(eid).fold() \
+            .coalesce(__.unfold(), create)
+        traversal = traversal.sideEffect(__.properties().drop())
+        return await self._add_properties(traversal, props, edge, refresh)
+
+    async def _update_properties(self, elem, traversal, props, refresh=True):
+        """
+        Replace the properties of an element that changed since it was last
+        loaded or saved, dropping and adding them in the same traversal.
+        """
+        changed = _changed_props(elem, props)
+        if changed is None:
+            traversal = traversal.sideEffect(__.properties().drop())
+        elif not changed:
+            return elem
+        else:
+            traversal = traversal.sideEffect(
+                __.properties(*changed).drop())
+            props = [prop for prop in props if prop[1] in changed]
+        return await self._add_properties(traversal, props, elem, refresh)
 
-    async def _update_vertex_properties(self, vertex, traversal, props):
-        await self._g.V(vertex.id).properties().drop().iterate()
-        return await self._add_properties(traversal, props, vertex)
+    async def _add_properties(self, traversal, props, elem, refresh=True):
+        traversal, _ = _add_property_steps(traversal, props)
+        return await self._simple_traversal(traversal, elem, refresh)
 
-    async def _update_edge_properties(self, edge, traversal, props):
-        await self._g.E(edge.id).properties().drop().iterate()
-        return await self._add_properties(traversal, props, edge)
 
-    async def _add_properties(self, traversal, props, elem):
-        binding = 0
-        for card, db_name, val, metaprops in props:
-            if not metaprops:
-                metaprops = {}
-            if val is not None:
-                key = ('k' + str(binding), db_name)
-                val = ('v' + str(binding), val)
-                if card:
-                    # Maybe use a dict here as a translator
-                    if card == Cardinality.list_:
-                        card = Cardinality.list_
-                    elif card == Cardinality.set_:
-                        card = Cardinality.set_
-                    else:
-                        card = Cardinality.single
-                    metas = [
-                        j
-                        for i in zip(metaprops.keys(), metaprops.values())
-                        for j in i
-                    ]
-                    traversal = traversal.property(card, key, val, *metas)
-                else:
-                    metas = [
-                        j
-                        for i in zip(metaprops.keys(), metaprops.values())
-                        for j in i
-                    ]
-                    traversal = traversal.property(key, val, *metas)
-                binding += 1
-        return await self._simple_traversal(traversal, elem)
+class _SessionRemote:
+    """Remote connection used for traversals overriding session options"""
+
+    def __init__(self, session, **options):
+        self._session = session
+        self._options = options
+
+    async def submit(self, bytecode):
+        return await self._session.submit(bytecode, **self._options)
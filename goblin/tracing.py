@@ -0,0 +1,224 @@
+"""Tracing of the traversals submitted by sessions"""
+
+import logging
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+from gremlin_python.process.traversal import Binding, Bytecode
+
+from goblin import exception
+
+logger = logging.getLogger(__name__)
+
+
+def _bytecode_bindings(bytecode, bindings=None):
+    """Collect the bindings of a bytecode, including nested traversals"""
+    if bindings is None:
+        bindings = {}
+    bindings.update(bytecode.bindings)
+    for instructions in (bytecode.source_instructions,
+                         bytecode.step_instructions):
+        for instruction in instructions:
+            for arg in instruction[1:]:
+                if isinstance(arg, Binding):
+                    bindings[arg.key] = arg.value
+                elif isinstance(arg, Bytecode):
+                    _bytecode_bindings(arg, bindings)
+    return bindings
+
+
+class QueryEvent:
+    """
+    A traversal submitted to the server, passed to the
+    :py:class:`Tracer<goblin.tracing.Tracer>` when it starts and ends.
+
+    :ivar str kind: Kind of round trip, as used by
+        :py:class:`Metrics<goblin.metrics.Metrics>`
+    :ivar str caller: Name of the session method that built the traversal
+    :ivar bytecode: Submitted `Bytecode`
+    :ivar float start: Start time, from `time.monotonic`
+    :ivar float duration: Time in seconds until the response ended. `None`
+        until the event ends
+    :ivar Exception error: Error raised submitting the traversal, if any
+    :ivar dict context: Storage for tracer specific data, e.g. spans
+    """
+
+    __slots__ = ('kind', 'caller', 'bytecode', 'start', 'duration', 'error',
+                 'context', '_bindings')
+
+    def __init__(self, kind, caller, bytecode):
+        self.kind = kind
+        self.caller = caller
+        self.bytecode = bytecode
+        self.start = time.monotonic()
+        self.duration = None
+        self.error = None
+        self.context = {}
+        self._bindings = None
+
+    @property
+    def bindings(self):
+        """`dict` of the traversal's bindings"""
+        if self._bindings is None:
+            self._bindings = _bytecode_bindings(self.bytecode)
+        return self._bindings
+
+    def __repr__(self):
+        return '<{}(kind={}, caller={}, duration={})>'.format(
+            self.__class__.__name__, self.kind, self.caller, self.duration)
+
+
+class Tracer:
+    """
+    Base class for tracers, notified when sessions submit traversals and
+    when their responses end. Passed to
+    :py:meth:`Goblin.open<goblin.app.Goblin.open>` or
+    :py:meth:`Goblin.session<goblin.app.Goblin.session>`.
+    """
+
+    def start(self, event):
+        """
+        Called before a traversal is submitted.
+
+        :param goblin.tracing.QueryEvent event:
+        """
+
+    def end(self, event):
+        """
+        Called when the response to a traversal ends, or submitting it
+        failed.
+
+        :param goblin.tracing.QueryEvent event:
+        """
+
+
+class MultiTracer(Tracer):
+    """Tracer notifying several tracers, in order"""
+
+    def __init__(self, *tracers):
+        self._tracers = tracers
+
+    def start(self, event):
+        for tracer in self._tracers:
+            tracer.start(event)
+
+    def end(self, event):
+        for tracer in reversed(self._tracers):
+            tracer.end(event)
+
+
+class SlowQueryLogger(Tracer):
+    """
+    Tracer logging traversals that take longer than a threshold, along with
+    the session method that built them and their bindings.
+
+    :param float threshold: Threshold in seconds
+    :param logging.Logger logger: Defaults to this module's logger
+    :param int level: Log level
+    """
+
+    def __init__(self, threshold, *, logger=None, level=logging.WARNING):
+        self._threshold = threshold
+        if logger is None:
+            logger = logging.getLogger(__name__)
+        self._logger = logger
+        self._level = level
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    def end(self, event):
+        if event.duration is not None and event.duration >= self._threshold:
+            self._logger.log(
+                self._level, 'Slow %s query from %s took %.3fs: %s %s',
+                event.kind, event.caller, event.duration, event.bytecode,
+                event.bindings)
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Tracer recording a span for each traversal using OpenTelemetry. Requires
+    the opentelemetry-api package.
+
+    :param tracer: OpenTelemetry tracer. Defaults to the tracer returned by
+        the global tracer provider
+    """
+
+    def __init__(self, tracer=None):
+        if otel_trace is None:
+            raise exception.ConfigurationError(
+                "OpenTelemetry tracing requires the opentelemetry-api package")
+        if tracer is None:
+            tracer = otel_trace.get_tracer(__name__)
+        self._tracer = tracer
+
+    def start(self, event):
+        span = self._tracer.start_span(
+            'goblin.{}'.format(event.caller),
+            kind=otel_trace.SpanKind.CLIENT,
+            attributes={'db.system': 'gremlin',
+                        'db.statement': str(event.bytecode),
+                        'goblin.kind': event.kind,
+                        'goblin.caller': event.caller})
+        event.context['otel_span'] = span
+
+    def end(self, event):
+        span = event.context.pop('otel_span', None)
+        if span is None:
+            return
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        span.end()
+
+
+class TracedRemote:
+    """
+    Remote connection wrapper notifying a tracer of the traversals submitted
+    through it.
+
+    :param remote_connection: Wrapped remote connection
+    :param goblin.tracing.Tracer tracer:
+    :param str kind: Kind of round trip
+    :param str caller: Name of the method that built the traversals
+    :param asyncio.BaseEventLoop loop:
+    """
+
+    def __init__(self, remote_connection, tracer, kind, caller, loop):
+        self._remote_connection = remote_connection
+        self._tracer = tracer
+        self._kind = kind
+        self._caller = caller
+        self._loop = loop
+
+    async def submit(self, bytecode):
+        event = QueryEvent(self._kind, self._caller, bytecode)
+        try:
+            self._tracer.start(event)
+        except Exception:
+            logger.exception('Tracer failed handling %r', event)
+        try:
+            remote_traversal = await self._remote_connection.submit(bytecode)
+        except Exception as e:
+            event.error = e
+            self._end(event)
+            raise
+        self._loop.create_task(
+            self._observe(remote_traversal.traversers, event))
+        return remote_traversal
+
+    async def _observe(self, result_set, event):
+        await result_set.done.wait()
+        self._end(event)
+
+    def _end(self, event):
+        event.duration = time.monotonic() - event.start
+        try:
+            self._tracer.end(event)
+        except Exception:
+            logger.exception('Tracer failed handling %r', event)
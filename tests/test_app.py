@@ -1,7 +1,7 @@
 import pytest
 
 import goblin
-from goblin import element
+from goblin import element, exception
 
 
 @pytest.mark.asyncio
@@ -53,3 +53,32 @@ async def test_aliases(app, aliases):
     session = await app.session()
     assert session._remote_connection._client.aliases == aliases
     await app.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_remote_connection(app):
+    session1 = await app.session()
+    session2 = await app.session()
+    assert session1.remote_connection is session2.remote_connection
+    await app.close()
+
+
+@pytest.mark.asyncio
+async def test_open_warmup(event_loop, gremlin_host, gremlin_port, aliases):
+    app = await goblin.Goblin.open(
+        event_loop, aliases=aliases, hosts=[gremlin_host], port=gremlin_port,
+        warmup=True, min_connections=2)
+    assert app.config['min_conns'] == 2
+    assert await app.ready(timeout=10)
+    await app.close()
+
+
+@pytest.mark.asyncio
+async def test_open_min_connections_configfile(event_loop, gremlin_host,
+                                               gremlin_port, aliases, tmpdir):
+    config = tmpdir.join('config.json')
+    config.write('{"min_conns": 1, "max_conns": 4}')
+    with pytest.raises(exception.ConfigurationError):
+        await goblin.Goblin.open(
+            event_loop, aliases=aliases, hosts=[gremlin_host],
+            port=gremlin_port, configfile=str(config), min_connections=2)
@@ -0,0 +1,59 @@
+import pytest
+
+from goblin import bulk
+
+
+def test_stats_throughput():
+    stats = bulk.BulkLoadStats()
+    assert stats.throughput == 0.0
+    stats.elements = 10
+    stats.failed = 2
+    stats.elapsed = 2.0
+    assert stats.throughput == 4.0
+
+
+@pytest.mark.asyncio
+async def test_bulk_load(app, person_class, knows_class):
+    results = []
+    loader = app.bulk_loader(batch_size=2, max_inflight=2,
+                             on_batch=results.append)
+    people = [person_class() for i in range(5)]
+    for i, person in enumerate(people):
+        person.name = 'person{}'.format(i)
+    knows = [knows_class(people[i], people[i + 1]) for i in range(4)]
+    stats = await loader.load(people + knows)
+    assert stats.elements == 9
+    assert stats.failed == 0
+    assert stats.batches == 5
+    assert sorted(result.index for result in results) == list(range(5))
+    assert all(hasattr(elem, 'id') for elem in people + knows)
+    session = await app.session()
+    assert not session.current
+    vertex = await session.get_vertex(people[3])
+    assert vertex.name == 'person3'
+    await app.close()
+
+
+@pytest.mark.asyncio
+async def test_bulk_load_async_iterable(app, person_class):
+    people = [person_class() for i in range(3)]
+
+    class AsyncPeople:
+        def __init__(self):
+            self._people = iter(people)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self._people)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    loader = app.bulk_loader(batch_size=2)
+    stats = await loader.load(AsyncPeople())
+    assert stats.elements == 3
+    assert stats.batches == 2
+    assert all(hasattr(person, 'id') for person in people)
+    await app.close()
@@ -1,5 +1,13 @@
-from goblin import element
-from goblin.fileio.graphson import dump, dumps, AdjList
+import gzip
+import io
+
+import pytest
+from gremlin_python.statics import long
+
+from goblin import element, exception, properties
+from goblin.fileio import backends, graphson
+from goblin.fileio.graphson import (
+    dump, dumps, iterload, AdjList)
 
 
 # def test_dump_simple_vertex(person):
@@ -47,4 +55,175 @@ def test_dumps(person_class, knows_class):
 
     print(dumps(al1))
     print(dumps(al2))
-    dump('/home/davebshow/test_graph.json', al1, al2)
\ No newline at end of file
+    dump('/home/davebshow/test_graph.json', al1, al2)
+
+
+def test_iterload(app, tmpdir, person_class, knows_class):
+    person = person_class()
+    person.id = 1
+    person.name = 'dave'
+    person.age = 37
+    person.birthplace = 'Iowa City'
+    person.nicknames = ['davebshow', 'crustee']
+    person.location = 'London, ON'
+    person.location('London, ON').year = 2010
+
+    person2 = person_class()
+    person2.id = 2
+    person2.name = 'itziri'
+    person2.age = 37
+    person2.birthplace = 'London'
+    person2.nicknames = ['chong', 'itsilly']
+    person2.location = 'Tacoma'
+
+    knows = knows_class(person, person2)
+    knows.notes = "married"
+    knows.id = 3
+
+    fpath = str(tmpdir.join('graph.json'))
+    dump(fpath, AdjList(vertex=person, inE=[], outE=[knows]),
+         AdjList(vertex=person2, inE=[knows], outE=[]))
+    adj_lists = iterload(fpath, app)
+    al1 = next(adj_lists)
+    assert isinstance(al1.vertex, person_class)
+    assert al1.vertex.id == 1
+    assert al1.vertex.name == 'dave'
+    assert al1.vertex.age == 37
+    assert [vp.value for vp in al1.vertex.nicknames] == [
+        'davebshow', 'crustee']
+    assert al1.vertex.location('London, ON').year == 2010
+    assert not al1.inE
+    out_edge, = al1.outE
+    assert isinstance(out_edge, knows_class)
+    assert out_edge.notes == 'married'
+    assert out_edge.source is al1.vertex
+    assert out_edge.target.id == 2
+    al2 = next(adj_lists)
+    in_edge, = al2.inE
+    assert in_edge.target is al2.vertex
+    assert in_edge.source.id == 1
+    assert list(adj_lists) == []
+
+
+def test_dump_parallel(tmpdir, person_class, knows_class):
+    adj_lists = []
+    previous = None
+    for i in range(10):
+        person = person_class()
+        person.id = i
+        person.name = 'person{}'.format(i)
+        person.age = i
+        person.birthplace = 'Iowa City'
+        person.nicknames = ['nickname{}'.format(i)]
+        person.location = 'London, ON'
+        out_edges = []
+        if previous is not None:
+            knows = knows_class(previous, person)
+            knows.id = 100 + i
+            out_edges.append(knows)
+        adj_lists.append(AdjList(vertex=person, inE=[], outE=out_edges))
+        previous = person
+
+    sequential = str(tmpdir.join('sequential.json'))
+    graphson.GraphSONExporter().dump(sequential, *adj_lists)
+    parallel = str(tmpdir.join('parallel.json'))
+    graphson.GraphSONExporter().dump_parallel(
+        parallel, iter(adj_lists), workers=2, chunksize=3)
+    with open(sequential) as f1, open(parallel) as f2:
+        assert f1.read() == f2.read()
+
+    parts = tmpdir.join('parts')
+    graphson.GraphSONExporter().dump_parallel(
+        str(parts), adj_lists, workers=2, chunksize=3, shards=2,
+        ordered=False)
+    assert sorted(p.basename for p in parts.listdir()) == [
+        'part-00000', 'part-00001']
+    lines = []
+    for part in parts.listdir():
+        lines.extend(part.readlines())
+    with open(sequential) as f:
+        assert sorted(lines) == sorted(f.readlines())
+
+
+def test_exporter_ids(person_class):
+    person = person_class()
+    person.id = 1
+    person.nicknames = ['davebshow', 'crustee']
+    adj_list = AdjList(vertex=person, inE=[], outE=[])
+    assert (graphson.GraphSONExporter().dumps(adj_list) ==
+            graphson.GraphSONExporter().dumps(adj_list))
+    allocator = graphson.IdAllocator(100)
+    assert allocator.reserve_block(5) == 100
+    assert allocator.allocate() == 105
+    exporter = graphson.GraphSONExporter(id_allocator=allocator)
+    exporter.dumps(adj_list)
+    assert allocator.next == 106 + graphson._count_vps(person)
+
+
+def test_compressed_rollover(app, tmpdir, person_class):
+    adj_lists = []
+    for i in range(5):
+        person = person_class()
+        person.id = i
+        person.name = 'person{}'.format(i)
+        adj_lists.append(AdjList(vertex=person, inE=[], outE=[]))
+    fpath = str(tmpdir.join('graph.json.gz'))
+    dump(fpath, *adj_lists)
+    with gzip.open(fpath, 'rt') as f:
+        assert len(f.readlines()) == 5
+    assert [al.vertex.name for al in iterload(fpath, app)] == [
+        'person{}'.format(i) for i in range(5)]
+
+    buf = io.BytesIO()
+    dump(buf, *adj_lists, compression='bz2')
+    buf.seek(0)
+    assert len(graphson.load(buf, app, compression='bz2')) == 5
+
+    parts = tmpdir.join('parts')
+    dump(str(parts), *adj_lists, compression='gzip', max_lines=2)
+    assert sorted(p.basename for p in parts.listdir()) == [
+        'part-00000.gz', 'part-00001.gz', 'part-00002.gz']
+    assert [al.vertex.id for al in iterload(str(parts), app)] == list(
+        range(5))
+
+
+def test_json_backends():
+    assert 'json' in backends.available_backends()
+    backend = backends.get_backend('json')
+    assert backend.name == 'json'
+    assert backends.get_backend(backend) is backend
+    assert backend.loads(backend.dumps({'a': [1]})) == {'a': [1]}
+    with pytest.raises(exception.ConfigurationError):
+        backends.get_backend('simplejson')
+
+
+def test_typed_value_writers():
+    values = [
+        (properties.String(), ['dave', None]),
+        (properties.Integer(), [1, long(1), None]),
+        (properties.Float(), [1.5, None]),
+        (properties.Boolean(), [True, False, None]),
+        (properties.Generic(), [[1, 'a'], None])]
+    for data_type, vals in values:
+        for val in vals:
+            assert (graphson._value_writer(data_type)(val) ==
+                    graphson.writer.toDict(val))
+
+
+def test_load_unregistered_labels(app):
+    line = (
+        '{"id": {"@type": "g:Int64", "@value": 1}, "label": "robot", '
+        '"properties": {"name": [{"id": {"@type": "g:Int64", "@value": 10}, '
+        '"value": "bender"}]}, "outE": {"builds": [{"id": {"@type": '
+        '"g:Int64", "@value": 5}, "inV": {"@type": "g:Int64", "@value": 2}, '
+        '"properties": {"year": {"@type": "g:Int32", "@value": 3000}}}]}}')
+    adj_list = graphson.loads(line, app)
+    assert isinstance(adj_list.vertex, element.GenericVertex)
+    assert adj_list.vertex.__label__ == 'robot'
+    assert adj_list.vertex.name == 'bender'
+    out_edge, = adj_list.outE
+    assert isinstance(out_edge, element.GenericEdge)
+    assert out_edge.__label__ == 'builds'
+    assert out_edge.year == 3000
+    assert out_edge.source is adj_list.vertex
+    assert out_edge.target.id == 2
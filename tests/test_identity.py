@@ -0,0 +1,65 @@
+import gc
+
+import pytest
+
+from goblin import identity
+
+
+def test_identity_map_stats(person):
+    identity_map = identity.IdentityMap()
+    identity_map[1] = person
+    assert identity_map.lookup(1) is person
+    assert identity_map.lookup(2) is None
+    # Only lookups are counted
+    assert identity_map.get(1) is person
+    assert identity_map.get(2) is None
+    assert 1 in identity_map
+    assert identity_map.hits == 1
+    assert identity_map.misses == 1
+    identity_map.reset_stats()
+    assert identity_map.hits == 0
+    assert identity_map.misses == 0
+
+
+def test_identity_map_expunge(person, place):
+    identity_map = identity.IdentityMap()
+    identity_map[1] = person
+    identity_map[2] = place
+    identity_map.expunge(person)
+    assert list(identity_map) == [2]
+    identity_map.clear()
+    assert not identity_map
+
+
+def test_weak_identity_map(person_class):
+    identity_map = identity.WeakIdentityMap()
+    person = person_class()
+    identity_map[1] = person
+    assert identity_map[1] is person
+    del person
+    gc.collect()
+    assert 1 not in identity_map
+
+
+def test_lru_identity_map(person_class):
+    identity_map = identity.LRUIdentityMap(maxsize=2)
+    people = [person_class() for i in range(3)]
+    identity_map[0] = people[0]
+    identity_map[1] = people[1]
+    assert identity_map[0] is people[0]
+    identity_map[2] = people[2]
+    assert list(identity_map) == [0, 2]
+    assert identity_map.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_session_identity_map(app, person_class):
+    session = await app.session(identity_map=identity.LRUIdentityMap(1))
+    dave = person_class()
+    leif = person_class()
+    await session.save(dave)
+    await session.save(leif)
+    assert list(session.current) == [app._get_hashable_id(leif.id)]
+    session.expunge(leif)
+    assert not session.current
+    await app.close()
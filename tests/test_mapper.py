@@ -1,6 +1,8 @@
+import collections
+
 import pytest
 
-from goblin import exception, properties
+from goblin import exception, mapper, properties
 
 
 def test_property_mapping(person, lives_in):
@@ -65,3 +67,84 @@ def test_getattr_doesnt_exist(person):
 def test_db_name_factory(person, place):
     assert person.__mapping__.nicknames == 'person__nicknames'
     assert place.__mapping__.zipcode == 'place__zipcode'
+
+
+def test_compiled_vertex_mapper(place_class):
+    place = place_class()
+    result = collections.namedtuple('Result', 'id label')(1, 'place')
+    props = {
+        'id': 1,
+        'label': 'place',
+        'name': ['Iowa City'],
+        'place__zipcode': [52240],
+        'historical_name': [{
+            'id': 10,
+            'key': 'historical_name',
+            'value': 'Iowa City',
+            'notes': 'Rename',
+            'year': 1900}],
+        'unmapped': ['value']}
+    place.__mapping__.mapper_func(result, props, place)
+    assert place.id == 1
+    assert place.name == 'Iowa City'
+    assert place.zipcode == 52240
+    assert place.historical_name('Iowa City').notes == 'Rename'
+    assert place.unmapped == 'value'
+
+
+def test_compiled_vertex_mapper_cardinalities(place_class):
+    result = collections.namedtuple('Result', 'id label')(1, 'place')
+
+    def props():
+        return {
+            'id': 1,
+            'label': 'place',
+            'historical_name': [
+                {'id': 10, 'key': 'historical_name', 'value': 'Iowa City',
+                 'year': 1900},
+                {'id': 11, 'key': 'historical_name', 'value': 'Iowa City'},
+                {'id': 12, 'key': 'historical_name', 'value': 'Lisbon',
+                 'notes': 'Founded'}],
+            'important_numbers': [1, 2],
+            'incorporated': [{'id': 13, 'key': 'incorporated',
+                              'value': True}]}
+    generic = mapper.map_vertex_to_ogm(result, props(), place_class(),
+                                       mapping=place_class.__mapping__)
+    compiled = place_class.__mapping__.mapper_func(result, props(),
+                                                   place_class())
+    for place in (generic, compiled):
+        assert [vp.value for vp in place.historical_name] == [
+            'Iowa City', 'Iowa City', 'Lisbon']
+        assert place.historical_name[0].year == 1900
+        assert place.historical_name('Lisbon').notes == 'Founded'
+        assert place.historical_name.vp_map[10] is place.historical_name[0]
+        assert {vp.value for vp in place.important_numbers} == {1, 2}
+        assert place.incorporated.value is True
+
+
+def test_compiled_edge_mapper(knows_class, person_class):
+    vertex = collections.namedtuple('Vertex', 'id label')
+    result = collections.namedtuple('Result', 'id label outV inV')(
+        3, 'knows', vertex(1, 'person'), vertex(2, 'person'))
+    knows = knows_class(person_class(), person_class())
+    knows.__mapping__.mapper_func(
+        result, {'id': 3, 'label': 'knows', 'notes': 'friends'}, knows)
+    assert knows.id == 3
+    assert knows.notes == 'friends'
+    assert knows.source.id == 1
+    assert knows.target.id == 2
+
+
+def test_compiled_props_to_db(place_class):
+    place = place_class()
+    place.name = 'Iowa City'
+    place.historical_name = ['Iowa City']
+    place.historical_name('Iowa City').year = 1839
+    assert callable(place.__mapping__.props_to_db)
+    props = place.__mapping__.props_to_db(place)
+    by_key = {db_name: (card, val, metaprops)
+              for card, db_name, val, metaprops in props}
+    assert by_key['name'] == (None, 'Iowa City', None)
+    assert by_key['historical_name'] == (
+        None, 'Iowa City', {'notes': None, 'year': 1839})
+    assert by_key['incorporated'] == (None, False, {})
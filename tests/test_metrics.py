@@ -0,0 +1,69 @@
+import pytest
+
+import goblin
+from goblin import exception, metrics
+
+
+def test_metrics_registry():
+    parent = metrics.Metrics()
+    registry = metrics.Metrics(parent=parent)
+    updates = []
+    registry.add_listener(lambda *update: updates.append(update))
+    registry.incr('round_trips.add')
+    registry.incr('bytes_out', 100)
+    registry.observe('round_trip_time.add', 0.5)
+    registry.observe('round_trip_time.add', 0.25)
+    with registry.timer('flush'):
+        pass
+    assert registry.counter('round_trips.add') == 1
+    assert registry.counters == {'round_trips.add': 1, 'bytes_out': 100}
+    assert registry.timer_stats('round_trip_time.add') == metrics.TimerStats(
+        2, 0.75, 0.5)
+    assert registry.timer_stats('flush').count == 1
+    assert updates[:3] == [('counter', 'round_trips.add', 1),
+                           ('counter', 'bytes_out', 100),
+                           ('timer', 'round_trip_time.add', 0.5)]
+    assert parent.counters == registry.counters
+    assert parent.timers == registry.timers
+    registry.reset()
+    assert not registry.counters
+    assert parent.counter('bytes_out') == 100
+
+
+@pytest.mark.asyncio
+async def test_session_metrics(event_loop, gremlin_host, gremlin_port,
+                               aliases, person):
+    registry = metrics.Metrics()
+    app = await goblin.Goblin.open(
+        event_loop, aliases=aliases, hosts=[gremlin_host], port=gremlin_port,
+        metrics=registry)
+    app.register(type(person))
+    session = await app.session(batch_size=10)
+    assert session.metrics.parent is registry
+    session.add(person)
+    await session.flush()
+    result = await session.g.V(person.id).next()
+    assert result is person
+    await session.remove_vertex(person)
+    assert session.metrics.counter('round_trips.add') == 1
+    assert session.metrics.counter('round_trips.submit') == 1
+    assert session.metrics.counter('round_trips.hydrate') == 1
+    assert session.metrics.counter('round_trips.drop') == 1
+    assert session.metrics.counter('elements_hydrated') == 1
+    assert session.metrics.counter('identity_map.hits') == 1
+    assert registry.counter('round_trips.add') == 1
+    assert registry.counter('bytes_out') > 0
+    await app.close()
+
+
+@pytest.mark.asyncio
+async def test_metrics_configfile_serializer(event_loop, gremlin_host,
+                                             gremlin_port, aliases, tmpdir):
+    config = tmpdir.join('config.json')
+    config.write('{"message_serializer": '
+                 '"goblin.driver.GraphSONMessageSerializer"}')
+    with pytest.raises(exception.ConfigurationError):
+        await goblin.Goblin.open(
+            event_loop, aliases=aliases, hosts=[gremlin_host],
+            port=gremlin_port, configfile=str(config),
+            metrics=metrics.Metrics())
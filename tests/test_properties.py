@@ -1,6 +1,7 @@
 """Test model properties."""
 
 import pytest
+from gremlin_python.process.traversal import Cardinality
 from gremlin_python.statics import long
 
 from goblin import element, exception, manager, properties
@@ -31,6 +32,14 @@ def test_false_bool_default(place):
     assert place.incorporated.value is False
 
 
+def test_vertex_property_default_materialized_once(place):
+    incorporated = place.incorporated
+    assert incorporated.value is False
+    assert place.incorporated is incorporated
+    incorporated.value = True
+    assert place.incorporated.value is True
+
+
 def test_validation(person):
     person.age = 10
     with pytest.raises(Exception):
@@ -248,3 +257,79 @@ class TestBoolean:
     def test_initval_to_db_true(self, boolean_class):
         boolean = boolean_class(False)
         assert not boolean.to_db()
+
+
+def test_slotted_element():
+    class SlottedPerson(element.Vertex, slots=True):
+        name = properties.Property(properties.String)
+        nicknames = element.VertexProperty(
+            properties.String, card=Cardinality.list_)
+
+    class SlottedKnows(element.Edge, slots=True):
+        notes = properties.Property(properties.String, default='N/A')
+
+    person = SlottedPerson()
+    assert not hasattr(person, '__dict__')
+    person.name = 'dave'
+    person.nicknames = ['davebshow']
+    person.id = 1
+    assert person.name == 'dave'
+    assert person.nicknames[0].value == 'davebshow'
+    assert person.id == 1
+    with pytest.raises(AttributeError):
+        person.undeclared = 'value'
+    knows = SlottedKnows(person, person)
+    assert not hasattr(knows, '__dict__')
+    assert knows.notes == 'N/A'
+    assert knows.source is person
+
+
+def test_vertex_property_manager_index(person):
+    person.nicknames = ['sly', 'big', 'guy', 'guy']
+    assert len(person.nicknames('guy')) == 2
+    person.nicknames.append('dude')
+    assert person.nicknames('dude').value == 'dude'
+    sly = person.nicknames('sly')
+    person.nicknames.vp_map[1] = sly
+    person.nicknames.remove(sly)
+    assert person.nicknames('sly') is None
+    assert not person.nicknames.vp_map
+    person.nicknames[0].value = 'small'
+    assert person.nicknames('big') is None
+    assert person.nicknames('small').value == 'small'
+
+
+def test_vertex_property_manager_index_clear(person):
+    person.nicknames = ['sly', 'big']
+    assert person.nicknames('sly').value == 'sly'
+    person.nicknames.clear()
+    person.nicknames.append('guy')
+    person.nicknames.append('dude')
+    assert person.nicknames('sly') is None
+    assert person.nicknames('guy').value == 'guy'
+    vp = person.nicknames('dude')
+    person.nicknames.vp_map[1] = vp
+    person.nicknames.clear()
+    person.nicknames.extend([vp, person.nicknames._new_vertex_prop('big')])
+    assert person.nicknames.vp_map == {1: vp}
+    person.nicknames[0] = person.nicknames._new_vertex_prop('small')
+    assert not person.nicknames.vp_map
+    assert person.nicknames('small').value == 'small'
+    person.nicknames.insert(0, vp)
+    vp.value = 'guy'
+    assert person.nicknames('guy') is vp
+
+
+def test_vertex_property_manager_value_versions(person_class):
+    dave = person_class()
+    leif = person_class()
+    dave.nicknames = ['sly']
+    leif.nicknames = ['big']
+    assert dave.nicknames('sly').value == 'sly'
+    leif.nicknames('big').value = 'guy'
+    # Changing another manager's values leaves the index current
+    assert dave.nicknames._index_is_current()
+    assert leif.nicknames('guy').value == 'guy'
+    dave.nicknames('sly').value = 'dude'
+    assert not dave.nicknames._index_is_current()
+    assert dave.nicknames('dude').value == 'dude'
@@ -1,10 +1,13 @@
 """Functional sessions tests"""
 
 import pytest
-from gremlin_python.process.traversal import Binding
+from aiogremlin.process.graph_traversal import __
+from gremlin_python.process.traversal import Binding, T
+from gremlin_python.statics import long
 
-from goblin import element
-from goblin.session import bindprop
+from goblin import driver, element, exception, metrics, properties
+from goblin.fileio import graphson
+from goblin.session import _result_type, bindprop
 
 
 def test_bindprop(person_class):
@@ -75,6 +78,77 @@ class TestCreationApi:
         assert lives_in.target.__label__ == 'place'
         await app.close()
 
+    @pytest.mark.asyncio
+    async def test_flush_chunks(self, app, person_class, place_class,
+                                lives_in_class):
+        session = await app.session(flush_chunk_size=2)
+        jon = person_class()
+        jon.name = 'jonathan'
+        montreal = place_class()
+        montreal.name = 'Montreal'
+        await session.save(montreal)
+        leif = person_class()
+        leif.name = 'leifur'
+        lives_in1 = lives_in_class(jon, montreal)
+        lives_in2 = lives_in_class(leif, montreal)
+        session.add(jon, lives_in1, leif, lives_in2)
+        ids = await session.flush()
+        assert ids == [jon.id, lives_in1.id, leif.id, lives_in2.id]
+        for elem in (jon, lives_in1, leif, lives_in2):
+            assert session.current[app._get_hashable_id(elem.id)] is elem
+        session.current.clear()
+        result = await session.g.E(lives_in2.id).next()
+        assert result.source.id == leif.id
+        assert result.target.id == montreal.id
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_flush_unsaved_edge_vertex(self, app, person, place,
+                                             lives_in):
+        session = await app.session()
+        lives_in.source = person
+        lives_in.target = place
+        session.add(person, lives_in)
+        with pytest.raises(exception.ElementError):
+            await session.flush()
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_flush_duplicates(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        leif = person_class()
+        leif.name = 'leif'
+        session.add(dave, leif, dave)
+        session.add(dave)
+        ids = await session.flush()
+        assert ids == [dave.id, leif.id]
+        count = await session._g.V(dave.id, leif.id).count().next()
+        assert count == 2
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_flush_failure_requeues(self, app, person_class, place,
+                                          lives_in_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        await session.save(dave)
+        leif = person_class()
+        leif.name = 'leif'
+        # place isn't saved, so creating the edge fails
+        lives_in = lives_in_class(leif, place)
+        dave.age = 37
+        session.add(dave, leif, lives_in)
+        with pytest.raises(exception.ElementError):
+            await session.flush()
+        assert list(session._pending.values()) == [leif, lives_in]
+        assert not hasattr(leif, 'id')
+        session.add(place)
+        assert list(session._pending.values()) == [leif, lives_in, place]
+        await app.close()
+
     @pytest.mark.asyncio
     async def test_create_edge_no_source(self, app, lives_in, person):
         session = await app.session()
@@ -245,6 +319,154 @@ class TestCreationApi:
         assert not result.age
         await app.close()
 
+    @pytest.mark.asyncio
+    async def test_update_vertex_changed_props(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        dave.nicknames = ['davebshow']
+        await session.save(dave)
+        vid = Binding('vid', dave.id)
+        prop_ids = await session._g.V(vid).properties(
+            person_class.nicknames).id().toList()
+        dave.age = 37
+        result = await session.save(dave)
+        assert result.age == 37
+        assert dave.__snapshot__[person_class.age] == [(37, None)]
+        # Unchanged properties aren't dropped and recreated
+        assert await session._g.V(vid).properties(
+            person_class.nicknames).id().toList() == prop_ids
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_save_no_refresh(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        result = await session.save(dave, refresh=False)
+        assert result is dave
+        assert hasattr(dave, 'id')
+        assert session.current[app._get_hashable_id(dave.id)] is dave
+        dave.age = 37
+        await session.save(dave, refresh=False)
+        stored = await session._g.V(Binding('vid', dave.id)).values(
+            person_class.age).next()
+        assert stored == 37
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_upsert_vertex_other_session(self, app, person_class):
+        session1 = await app.session()
+        session2 = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        await session1.save(dave)
+        vid = dave.id
+        dave.name = 'david'
+        result = await session2.save(dave)
+        assert result.id == vid
+        assert result.name == 'david'
+        assert session2.current[app._get_hashable_id(vid)] is dave
+        count = await session2._g.V(Binding('vid', vid)).count().next()
+        assert count == 1
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_upsert_missing_vertex(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        await session.save(dave)
+        await session.g.V(Binding('vid', dave.id)).drop().iterate()
+        session.current.clear()
+        result = await session.save(dave)
+        assert result is dave
+        assert dave.name == 'dave'
+        assert session.current[app._get_hashable_id(dave.id)] is dave
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_update_removed_vertex(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        await session.save(dave)
+        vid = dave.id
+        # Removed out of band, still tracked by the session
+        await session._g.V(Binding('vid', vid)).drop().iterate()
+        assert session.current[app._get_hashable_id(vid)] is dave
+        dave.age = 37
+        result = await session.save(dave)
+        assert result is dave
+        assert dave.name == 'dave'
+        assert dave.age == 37
+        assert session.current[app._get_hashable_id(dave.id)] is dave
+        count = await session._g.V(Binding('vid', dave.id)).count().next()
+        assert count == 1
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_update_removed_edge_vertices(self, app, person_class,
+                                                knows_class):
+        session = await app.session()
+        dave = person_class()
+        leif = person_class()
+        knows = knows_class(dave, leif)
+        session.add(dave, leif, knows)
+        await session.flush()
+        await session._g.V(Binding('vid', dave.id)).drop().iterate()
+        knows.notes = 'removed'
+        with pytest.raises(exception.ElementError):
+            await session.save(knows)
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_update_vertex_unchanged(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        await session.save(dave)
+        snapshot = dave.__snapshot__
+        result = await session.save(dave)
+        assert result is dave
+        assert dave.__snapshot__ is snapshot
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_update_vertex_requeried(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        await session.save(dave)
+        dave.age = 40
+        # Hydrating the tracked vertex again keeps the unsaved change
+        result = await session.get_vertex(dave)
+        assert result is dave
+        assert dave.age == 40
+        await session.save(dave)
+        stored = await session._g.V(Binding('vid', dave.id)).values(
+            person_class.age).next()
+        assert stored == 40
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_update_vertex_mutated_value(self, app):
+
+        class Document(element.Vertex):
+            tags = properties.Property(properties.Generic)
+
+        app.register(Document)
+        session = await app.session()
+        doc = Document()
+        doc.tags = ['a']
+        await session.save(doc)
+        doc.tags.append('b')
+        await session.save(doc)
+        stored = await session._g.V(Binding('vid', doc.id)).values(
+            'tags').next()
+        assert stored == ['a', 'b']
+        await app.close()
+
     @pytest.mark.skipif(
         pytest.config.getoption('provider') == 'dse', reason='DSE')
     @pytest.mark.asyncio
@@ -399,3 +621,284 @@ class TestTraversalApi:
             # assert isinstance(item['x'], person_class)
             assert isinstance(item['y'], dict)
         await app.close()
+
+
+def test_result_type():
+    g = driver.Graph().traversal()
+    assert _result_type(g.V().hasLabel('person').limit(2).bytecode) == \
+        'vertex'
+    assert _result_type(g.V().outE('knows').bytecode) == 'edge'
+    assert _result_type(g.V().values('name').bytecode) is None
+    assert _result_type(g.V().as_('a').select('a').bytecode) is None
+
+
+class TestProjectedTraversalApi:
+    @pytest.mark.asyncio
+    async def test_projected_vertex(self, app, person_class):
+        session = await app.session(project_results=True)
+        dave = person_class()
+        dave.name = 'dave'
+        dave.nicknames = ['davebshow']
+        await session.save(dave)
+        session.current.clear()
+        result = await session.g.V(Binding('vid', dave.id)).next()
+        assert isinstance(result, person_class)
+        assert result.id == dave.id
+        assert result.name == 'dave'
+        assert result.nicknames[0].value == 'davebshow'
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_projected_edge(self, app, knows_class):
+        session = await app.session(project_results=True)
+        p1 = await session.g.addV('person').next()
+        p2 = await session.g.addV('person').next()
+        e1 = await session.g.V(Binding('p1_id', p1.id)).addE('knows').to(
+            session.g.V(Binding('p2_id', p2.id))).property(
+                knows_class.notes, 'somehow').next()
+        assert isinstance(e1, knows_class)
+        assert e1.notes == 'somehow'
+        assert e1.source.id == p1.id
+        assert e1.target.id == p2.id
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_projected_non_element(self, app):
+        session = await app.session(project_results=True)
+        await session.g.addV('person').property('name', 'leif').next()
+        names = await session.g.V().hasLabel('person').values(
+            'name').toList()
+        assert 'leif' in names
+        await app.close()
+
+
+class TestBatchedTraversalApi:
+    @pytest.mark.asyncio
+    async def test_batched_vertices(self, app, person_class):
+        session = await app.session(batch_size=2)
+        dave = person_class()
+        dave.name = 'dave'
+        leif = person_class()
+        leif.name = 'leif'
+        jon = person_class()
+        jon.name = 'jon'
+        session.add(dave, leif, jon)
+        await session.flush()
+        session.current.clear()
+        ids = [dave.id, leif.id, jon.id]
+        results = await session.g.V(*ids).toList()
+        assert [result.id for result in results] == ids
+        assert [result.name for result in results] == ['dave', 'leif', 'jon']
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_batched_mixed_results(self, app, knows_class):
+        session = await app.session(batch_size=10, batch_window=0.01)
+        p1 = await session.g.addV('person').next()
+        p2 = await session.g.addV('person').next()
+        await session.g.V(Binding('p1_id', p1.id)).addE('knows').to(
+            session.g.V(Binding('p2_id', p2.id))).property(
+                knows_class.notes, 'somehow').next()
+        results = await session.g.V(Binding('p1_id', p1.id)).union(
+            __.identity(), __.outE(), __.count()).toList()
+        assert results[0] is p1
+        assert isinstance(results[1], knows_class)
+        assert results[1].notes == 'somehow'
+        assert results[2] == 1
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_hydration_ordered(self, app, person_class):
+        session = await app.session(max_inflight_hydrations=4)
+        people = [person_class() for i in range(8)]
+        for i, person in enumerate(people):
+            person.name = str(i)
+        session.add(*people)
+        await session.flush()
+        session.current.clear()
+        ids = [person.id for person in people]
+        results = await session.g.V(*ids).toList()
+        assert [result.name for result in results] == [
+            str(i) for i in range(8)]
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_hydration_unordered(self, app, person_class):
+        session = await app.session(
+            batch_size=2, max_inflight_hydrations=4, ordered_results=False)
+        people = [person_class() for i in range(8)]
+        for i, person in enumerate(people):
+            person.name = str(i)
+        session.add(*people)
+        await session.flush()
+        session.current.clear()
+        ids = [person.id for person in people]
+        results = await session.g.V(*ids).toList()
+        assert sorted(result.name for result in results) == [
+            str(i) for i in range(8)]
+        await app.close()
+
+
+class TestLazyTraversalApi:
+    @pytest.mark.asyncio
+    async def test_lazy_proxies(self, app, person_class):
+        session = await app.session()
+        dave = person_class()
+        dave.name = 'dave'
+        leif = person_class()
+        leif.name = 'leif'
+        session.add(dave, leif)
+        await session.flush()
+        session.current.clear()
+        ids = [dave.id, leif.id]
+        proxies = await session.traversal(lazy=True).V(*ids).toList()
+        assert all(isinstance(proxy, element.ElementProxy)
+                   for proxy in proxies)
+        assert [proxy.id for proxy in proxies] == ids
+        assert not any(proxy.loaded for proxy in proxies)
+        with pytest.raises(exception.ElementError):
+            proxies[0].name
+        loaded = await proxies[0].load()
+        assert isinstance(loaded, person_class)
+        assert proxies[0].name == 'dave'
+        # Loaded in the same batch
+        assert proxies[1].loaded
+        assert proxies[1].name == 'leif'
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_load_proxies_chunks(self, app, person_class):
+        registry = metrics.Metrics()
+        session = await app.session(flush_chunk_size=2, metrics=registry)
+        people = [person_class() for i in range(3)]
+        session.add(*people)
+        await session.flush()
+        session.current.clear()
+        proxies = await session.traversal(lazy=True).V(
+            *[person.id for person in people]).toList()
+        await session.load_proxies()
+        assert all(proxy.loaded for proxy in proxies)
+        assert registry.counter('round_trips.hydrate') == 2
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_lazy_proxy_current(self, app, person_class):
+        session = await app.session(lazy=True)
+        dave = person_class()
+        dave.name = 'dave'
+        await session.save(dave)
+        proxy = await session.g.V(Binding('vid', dave.id)).next()
+        assert proxy.loaded
+        assert proxy.element is dave
+        await app.close()
+
+
+class TestExportApi:
+    @pytest.mark.asyncio
+    async def test_export_graphson(self, app, tmpdir, person_class,
+                                   knows_class):
+        session = await app.session()
+        await session.g.V().drop().iterate()
+        dave = person_class()
+        dave.name = 'dave'
+        leif = person_class()
+        leif.name = 'leif'
+        jon = person_class()
+        jon.name = 'jon'
+        knows = knows_class(dave, leif)
+        knows.notes = 'friends'
+        session.add(dave, leif, jon, knows)
+        await session.flush()
+        path = str(tmpdir.join('graph.json'))
+        checkpoint = str(tmpdir.join('graph.checkpoint'))
+        count = await session.export_graphson(
+            path, 'person', page_size=2, checkpoint=checkpoint)
+        assert count == 3
+        assert not tmpdir.join('graph.checkpoint').exists()
+        adj_lists = {al.vertex.name: al for al in graphson.iterload(path, app)}
+        assert set(adj_lists) == {'dave', 'leif', 'jon'}
+        out_edge, = adj_lists['dave'].outE
+        assert out_edge.notes == 'friends'
+        assert out_edge.target.id == leif.id
+        in_edge, = adj_lists['leif'].inE
+        assert in_edge.source.id == dave.id
+        assert not adj_lists['jon'].inE
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_export_graphson_resume(self, app, tmpdir, person_class):
+        session = await app.session()
+        await session.g.V().drop().iterate()
+        for i in range(5):
+            person = person_class()
+            person.name = 'person{}'.format(i)
+            person.nicknames = ['nickname{}'.format(i)]
+            session.add(person)
+        await session.flush()
+        expected = str(tmpdir.join('expected.json'))
+        assert await session.export_graphson(expected, page_size=2) == 5
+
+        class InterruptedExporter(graphson.GraphSONExporter):
+            remaining = 3
+
+            def dumps(self, adj_list):
+                if not self.remaining:
+                    raise RuntimeError('interrupted')
+                self.remaining -= 1
+                return super().dumps(adj_list)
+
+        path = str(tmpdir.join('graph.json'))
+        checkpoint = str(tmpdir.join('graph.checkpoint'))
+        with pytest.raises(RuntimeError):
+            await session.export_graphson(
+                path, page_size=2, checkpoint=checkpoint,
+                exporter=InterruptedExporter(json_backend=app.json_backend))
+        assert tmpdir.join('graph.checkpoint').exists()
+        # The partial page written after the checkpoint is discarded
+        count = await session.export_graphson(
+            path, page_size=2, checkpoint=checkpoint)
+        assert count == 5
+        assert not tmpdir.join('graph.checkpoint').exists()
+        with open(expected) as f1, open(path) as f2:
+            assert f1.read() == f2.read()
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_export_graphson_resume_long_ids(self, app, tmpdir):
+        session = await app.session()
+        await session.g.V().drop().iterate()
+        ids = [long(2 ** 31 + i) for i in range(3)]
+        for vid in ids:
+            await session._g.addV('person').property(T.id, vid) \
+                .property('name', 'person').iterate()
+        path = tmpdir.join('graph.json')
+        path.write('')
+        checkpoint = tmpdir.join('graph.checkpoint')
+        checkpoint.write(
+            '{{"count": 1, "last_id": {}, "position": 0, "vp_id": 10}}'.format(
+                ids[0]))
+        count = await session.export_graphson(
+            str(path), page_size=2, checkpoint=str(checkpoint))
+        assert count == 3
+        assert len(path.readlines()) == 2
+        await app.close()
+
+    @pytest.mark.asyncio
+    async def test_export_graphson_missing_output(self, app, tmpdir,
+                                                  person_class):
+        session = await app.session()
+        await session.g.V().drop().iterate()
+        for i in range(3):
+            person = person_class()
+            person.name = 'person{}'.format(i)
+            session.add(person)
+        await session.flush()
+        path = tmpdir.join('graph.json')
+        checkpoint = tmpdir.join('graph.checkpoint')
+        checkpoint.write(
+            '{"count": 2, "last_id": 0, "position": 100, "vp_id": 10}')
+        count = await session.export_graphson(
+            str(path), page_size=2, checkpoint=str(checkpoint))
+        assert count == 3
+        assert len(path.readlines()) == 3
+        await app.close()
@@ -0,0 +1,84 @@
+import logging
+
+import pytest
+from aiogremlin.process.graph_traversal import __
+from gremlin_python.process.traversal import Binding
+
+from goblin import exception, tracing
+
+
+class RecordingTracer(tracing.Tracer):
+
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def start(self, event):
+        self.started.append(event)
+
+    def end(self, event):
+        self.ended.append(event)
+
+
+def test_query_event_bindings():
+    traversal = __.V(Binding('vid', 1)).fold().coalesce(
+        __.unfold(), __.V(Binding('sid', 2)).addE('knows'))
+    event = tracing.QueryEvent('upsert', '_upsert_edge', traversal.bytecode)
+    assert event.bindings == {'vid': 1, 'sid': 2}
+    assert event.duration is None
+
+
+def test_slow_query_logger(caplog):
+    slow_query_logger = tracing.SlowQueryLogger(0.5)
+    event = tracing.QueryEvent('label', '_deserialize_result',
+                               __.V(Binding('vid', 1)).label().bytecode)
+    with caplog.at_level(logging.WARNING, logger='goblin.tracing'):
+        event.duration = 0.1
+        slow_query_logger.end(event)
+        assert not caplog.records
+        event.duration = 1.0
+        slow_query_logger.end(event)
+    record, = caplog.records
+    assert '_deserialize_result' in record.getMessage()
+    assert "{'vid': 1}" in record.getMessage()
+
+
+def test_opentelemetry_tracer_requires_package():
+    if tracing.otel_trace is not None:
+        pytest.skip('opentelemetry is installed')
+    with pytest.raises(exception.ConfigurationError):
+        tracing.OpenTelemetryTracer()
+
+
+@pytest.mark.asyncio
+async def test_session_tracer(app, person):
+    tracer = RecordingTracer()
+    session = await app.session(tracer=tracer)
+    session.add(person)
+    await session.flush()
+    person.name = 'dave'
+    await session.save(person)
+    await session.remove_vertex(person)
+    assert [event.caller for event in tracer.started] == [
+        '_create_chunk', '_update_vertex', 'remove_vertex']
+    assert [event.kind for event in tracer.started] == [
+        'add', 'update', 'drop']
+    assert tracer.started[2].bindings == {'vid': person.id}
+    await app.close()
+    for event in tracer.ended:
+        assert event.duration >= 0
+
+
+class FailingTracer(tracing.Tracer):
+
+    def start(self, event):
+        raise RuntimeError('exporter failed')
+
+
+@pytest.mark.asyncio
+async def test_session_failing_tracer(app, person):
+    session = await app.session(tracer=FailingTracer())
+    session.add(person)
+    await session.flush()
+    assert person.id is not None
+    await app.close()